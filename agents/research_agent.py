@@ -1,50 +1,119 @@
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
 from tools.web_search import WebSearchTool
+from tools.query_planner import QueryPlan, QueryPlanner, company_queries, person_queries
+from config import Config
+from tools.analyzer_base import AnalyzerBase
 from tools.llm_analyzer import LLMAnalyzer
+from tools.local_analyzer import LocalAnalyzer
 from utils.report_generator import ReportGenerator
 from utils.data_processor import DataProcessor
+from utils.corpus_archive import CorpusArchive
+from utils.deadline import Deadline
+from utils.disambiguation import NameDisambiguator
+from utils.entity_normalizer import get_entity_normalizer
+from utils.search_result import SearchResult
+from utils.scheduler import propagate, scheduling_priority
+from utils.token_usage import TokenUsage
+from utils.transport import Transport
 
 class ResearchAgent:
-    def __init__(self):
-        self.web_search = WebSearchTool()
-        self.llm_analyzer = LLMAnalyzer()
+    def __init__(self, analyzer: str = None, transport: Transport = None, token_budget: int = None):
+        # The transport carries every Jina and Gemini call, so runs can be recorded and replayed
+        self.transport = transport or Transport()
+        # Gemini tokens (input + output) each report may spend; None means unlimited
+        self.token_budget = token_budget if token_budget is not None else Config.RUN_TOKEN_BUDGET
+        self.web_search = WebSearchTool(self.transport)
+        self.query_planner = QueryPlanner()
+        self.llm_analyzer = self._create_analyzer(analyzer or Config.ANALYZER_BACKEND)
         self.report_generator = ReportGenerator()
         self.data_processor = DataProcessor()
+        self.disambiguator = NameDisambiguator()
+        self.normalizer = get_entity_normalizer()
+        self.corpus_archive = CorpusArchive() if Config.CORPUS_ARCHIVE else None
     
-    def research_person_and_company(self, person_name: str, company_name: str) -> Dict:
-        """Main research function that orchestrates the entire process"""
-        
-        print(f"🔍 Starting research for {person_name} at {company_name}")
-        
-        # Step 1: Search for person information
-        print("📊 Searching for person information...")
-        person_results = self.web_search.search_person(person_name, company_name)
+    def _create_analyzer(self, backend: str) -> AnalyzerBase:
+        """Build the analyzer backend: gemini, local, or auto (Gemini with local fallback)"""
+        if backend == 'local':
+            return LocalAnalyzer()
+        if backend == 'auto':
+            return LLMAnalyzer(fallback=LocalAnalyzer(), transport=self.transport)
+        return LLMAnalyzer(transport=self.transport)
+    
+    def prefetch_person(self, person_name: str) -> None:
+        """Start the person searches while the user is still typing the company"""
+        if Config.SPECULATIVE_PREFETCH:
+            person_name = self.normalizer.canonical('person', person_name)
+            self.web_search.prefetch([(query, 5) for query in person_queries(person_name)])
+    
+    def prefetch_company(self, person_name: str, company_name: str) -> None:
+        """Start the name-plus-company and company searches while the user picks a mode"""
+        if Config.SPECULATIVE_PREFETCH:
+            person_name, company_name = self._canonical_names(person_name, company_name)
+            # Person queries already prefetched are not sent again
+            queries = person_queries(person_name, company_name) + company_queries(company_name)
+            self.web_search.prefetch([(query, 5) for query in queries])
+    
+    def cancel_prefetch(self) -> None:
+        """Abandon speculative searches after the user quits or changes the input"""
+        self.web_search.cancel_prefetch()
+    
+    def research_person_and_company(self, person_name: str, company_name: str,
+                                    formats: List[str] = None, deadline: float = None) -> Dict:
+        """Main research function that orchestrates the entire process
         
-        # Step 2: Search for company information
-        print("🏢 Searching for company information...")
-        company_results = self.web_search.search_company(company_name)
+        deadline is a time budget in seconds; stages that cannot finish in time are
+        cancelled and the report marks their sections as incomplete.
+        """
+        formats = formats or ['markdown']
+        deadline = Deadline.coerce(deadline)
         
-        # Step 3: Search for social media and blog content
-        print("💬 Searching for social content and opinions...")
-        social_results = self.web_search.search_social_content(person_name)
+        print(f"🔍 Starting research for {person_name} at {company_name}")
         
-        # Step 4: Analyze person data
-        print("🧠 Analyzing person data...")
-        person_analysis = self.llm_analyzer.analyze_person_data(
-            person_name, company_name, person_results
-        )
+        # Steps 1-3: Plan every person, company and social search up front and run them as one batch
+        print("📊 Searching for person, company and social information...")
+        plan = self.query_planner.full_plan(person_name, company_name)
+        results = self._run_plan(plan, deadline)
+        self._archive_corpus('full', person_name, company_name, plan, results)
         
-        # Step 5: Analyze company data
-        print("🏭 Analyzing company data...")
-        company_analysis = self.llm_analyzer.analyze_company_data(
-            company_name, company_results, person_name
-        )
+        return self._analyze_full(person_name, company_name, plan, results, formats, deadline)
+    
+    def _analyze_full(self, person_name: str, company_name: str, plan: QueryPlan, results: Dict[str, List[Dict]],
+                      formats: List[str], deadline: Deadline) -> Dict:
+        """Analysis and report steps of full research, on search results already in hand"""
+        dropped = self._disambiguate(results, ['person', 'social'], person_name, company_name)
+        person_results = results['person']
+        company_results = results['company']
+        social_results = results['social']
         
-        # Step 6: Extract opinions and insights
-        print("💡 Extracting opinions and insights...")
-        insights_analysis = self.llm_analyzer.extract_opinions_and_insights(
-            person_name, social_results
-        )
+        # Steps 4-6: Analyze person and company data and extract opinions, concurrently
+        print("🧠 Analyzing person data, company data and social insights...")
+        usage = TokenUsage(self.token_budget)
+        skipped = self._fit_token_budget(usage, {
+            'person': person_results, 'company': company_results, 'social': social_results
+        }, optional=['social'])
+        stages = {
+            'person': lambda: self.llm_analyzer.analyze_person_data(
+                person_name, company_name, person_results, deadline, usage
+            ),
+            'company': lambda: self.llm_analyzer.analyze_company_data(
+                company_name, company_results, person_name, deadline, usage
+            ),
+            'social': lambda: self.llm_analyzer.extract_opinions_and_insights(
+                person_name, social_results, deadline, usage
+            )
+        }
+        analyses = self._run_stages({name: stage for name, stage in stages.items() if name not in skipped}, deadline)
+        person_analysis = analyses['person'] or self.llm_analyzer.incomplete_analysis('person')
+        company_analysis = analyses['company'] or self.llm_analyzer.incomplete_analysis('company')
+        if 'social' in skipped:
+            insights_analysis = self.llm_analyzer.skipped_insights()
+        else:
+            insights_analysis = analyses['social'] or self.llm_analyzer.incomplete_insights()
+        self._mark_incomplete_searches(plan, {
+            'person': person_analysis, 'company': company_analysis, 'social': insights_analysis
+        })
+        self._release_results(results)
         
         # Step 7: Process and clean data
         research_data = {
@@ -66,82 +135,413 @@ class ResearchAgent:
         }
         
         processed_data = self.data_processor.process_research_data(research_data)
+        processed_data['metadata']['search_queries'] = plan.stats()
+        processed_data['metadata']['dropped_results'] = dropped
+        processed_data['metadata']['token_usage'] = usage.to_dict()
         
         # Step 8: Generate comprehensive report
         print("📝 Generating comprehensive report...")
-        report = self.report_generator.generate_comprehensive_report(processed_data)
+        reports = self.report_generator.render_comprehensive_report(processed_data, formats)
         
-        print("✅ Research completed successfully!")
+        if processed_data['metadata']['incomplete_sections']:
+            print("⏱️  Deadline reached; returning a partial report")
+        else:
+            print("✅ Research completed successfully!")
         
         return {
-            'report': report,
+            'report': reports[formats[0]],
+            'reports': reports,
             'raw_data': processed_data,
             'person_type': person_analysis.get('type', 'unknown'),
-            'company_type': company_analysis.get('type', 'unknown')
+            'company_type': company_analysis.get('type', 'unknown'),
+            'search_stats': plan.stats(),
+            'dropped_results': dropped,
+            'token_usage': usage.to_dict()
         }
     
-    def quick_research(self, person_name: str, company_name: str) -> str:
+    def run(self, mode: str, person_name: str, company_name: str, formats: List[str] = None,
+            deadline: float = None) -> Dict:
+        """Run research in the given mode and return the report with its data"""
+        formats = formats or ['markdown']
+        person_name, company_name = self._canonical_names(person_name, company_name)
+        
+        if mode == 'quick':
+            result = self._quick_research(person_name, company_name, formats, deadline)
+        elif mode == 'investor':
+            result = self.research_investor_focus(person_name, company_name, formats, deadline)
+        else:
+            mode = 'full'
+            result = self.research_person_and_company(person_name, company_name, formats, deadline)
+        
+        result['mode'] = mode
+        return result
+    
+    def reanalyze(self, corpus: Dict, formats: List[str] = None, deadline: float = None) -> Dict:
+        """Analyze an archived search corpus again and render fresh reports, without searching
+        
+        corpus is a run loaded from the CorpusArchive: mode, person, company, the
+        search results per group and the groups the original run's deadline cut short.
+        """
+        formats = formats or ['markdown']
+        mode = corpus['mode']
+        analyze = {
+            'full': self._analyze_full,
+            'quick': self._analyze_quick,
+            'investor': self._analyze_investor
+        }[mode]
+        
+        print(f"♻️  Re-analyzing {mode} corpus #{corpus['id']} for {corpus['person']} at {corpus['company']}")
+        plan = self.query_planner.plan(mode, corpus['person'], corpus['company'])
+        # Groups whose searches were cut short then are still incomplete now
+        plan.incomplete_groups.update(corpus.get('incomplete_groups', []))
+        result = analyze(corpus['person'], corpus['company'], plan, corpus['results'], formats,
+                         Deadline.coerce(deadline))
+        result['mode'] = mode
+        return result
+    
+    def quick_research(self, person_name: str, company_name: str, output_format: str = 'markdown',
+                       deadline: float = None) -> str:
         """Quick research for basic information only"""
+        return self._quick_research(person_name, company_name, [output_format], deadline)['report']
+    
+    def _quick_research(self, person_name: str, company_name: str, formats: List[str],
+                        deadline: float = None) -> Dict:
+        """Quick research returning the report together with its analyses"""
+        deadline = Deadline.coerce(deadline)
         
         print(f"⚡ Quick research for {person_name} at {company_name}")
         
-        # Basic searches
-        person_results = self.web_search.search_person(person_name, company_name)
-        company_results = self.web_search.search_company(company_name)
+        # Basic searches, highest-value queries first, stopping once each side has enough sources
+        plan = self.query_planner.quick_plan(person_name, company_name)
+        results = self._run_plan(plan, deadline)
+        self._archive_corpus('quick', person_name, company_name, plan, results)
         
-        # Quick analysis
-        person_analysis = self.llm_analyzer.analyze_person_data(
-            person_name, company_name, person_results[:3]  # Limit results for speed
-        )
+        return self._analyze_quick(person_name, company_name, plan, results, formats, deadline)
+    
+    def _analyze_quick(self, person_name: str, company_name: str, plan: QueryPlan, results: Dict[str, List[Dict]],
+                       formats: List[str], deadline: Deadline) -> Dict:
+        """Analysis and report steps of quick research, on search results already in hand"""
+        dropped = self._disambiguate(results, ['person'], person_name, company_name)
+        person_results = results['person']
+        company_results = results['company']
         
-        company_analysis = self.llm_analyzer.analyze_company_data(
-            company_name, company_results[:3], person_name
-        )
+        # Quick analysis
+        usage = TokenUsage(self.token_budget)
+        self._fit_token_budget(usage, {'person': person_results, 'company': company_results})
+        analyses = self._run_stages({
+            'person': lambda: self.llm_analyzer.analyze_person_data(
+                person_name, company_name, person_results, deadline, usage
+            ),
+            'company': lambda: self.llm_analyzer.analyze_company_data(
+                company_name, company_results, person_name, deadline, usage
+            )
+        }, deadline)
+        person_analysis = analyses['person'] or self.llm_analyzer.incomplete_analysis('person')
+        company_analysis = analyses['company'] or self.llm_analyzer.incomplete_analysis('company')
+        self._mark_incomplete_searches(plan, {'person': person_analysis, 'company': company_analysis})
+        self._release_results(results)
         
         # Generate quick report
-        report = self.report_generator.generate_quick_report(
-            person_name, company_name, person_analysis, company_analysis
+        reports = self.report_generator.render_quick_report(
+            person_name, company_name, person_analysis, company_analysis, formats
         )
         
-        return report
+        return {
+            'report': reports[formats[0]],
+            'reports': reports,
+            'raw_data': {
+                'person': {'name': person_name, 'company': company_name, 'analysis': person_analysis},
+                'company': {'name': company_name, 'analysis': company_analysis},
+                # Same place as in full reports, so archived reports of every mode keep their token counts
+                'metadata': {'token_usage': usage.to_dict()}
+            },
+            'person_type': person_analysis.get('type', 'unknown'),
+            'company_type': company_analysis.get('type', 'unknown'),
+            'search_stats': plan.stats(),
+            'dropped_results': dropped,
+            'token_usage': usage.to_dict()
+        }
     
-    def research_investor_focus(self, person_name: str, vc_firm: str) -> Dict:
-        """Specialized research for VCs and investors"""
+    def batch_quick_research(self, entities: List[Tuple[str, str]], formats: List[str] = None,
+                             deadline: float = None, priority: str = 'batch') -> List[Dict]:
+        """Quick research for many (person, company) pairs, sharing Gemini requests across them
         
-        print(f"💼 Researching investor {person_name} at {vc_firm}")
+        Searches still run per entity; the analyses are packed several entities per
+        request by the analyzer, which matters when requests-per-minute quota is the limit.
+        Rows naming the same person and company (by normalized key) are researched once,
+        and each company is analyzed once however many people work there.
+        The calls run in the batch priority class by default, behind interactive work.
+        """
+        entities = [self._canonical_names(person_name, company_name) for person_name, company_name in entities]
+        distinct = {}
+        for entity in entities:
+            distinct.setdefault(
+                (self.normalizer.person_key(entity[0]), self.normalizer.company_key(entity[1])), entity
+            )
+        if len(distinct) < len(entities):
+            print(f"🔗 {len(entities) - len(distinct)} duplicate rows share another row's research")
         
-        # Investor-specific searches
-        investor_queries = [
-            f'"{person_name}" "{vc_firm}" portfolio investments',
-            f'"{person_name}" investment thesis',
-            f'"{vc_firm}" portfolio companies',
-            f'"{vc_firm}" investment focus areas'
+        with scheduling_priority(priority):
+            results = self._batch_quick_research(list(distinct.values()), formats, deadline)
+        by_key = dict(zip(distinct, results))
+        return [
+            dict(by_key[(self.normalizer.person_key(person_name), self.normalizer.company_key(company_name))])
+            for person_name, company_name in entities
         ]
+    
+    def _batch_quick_research(self, entities: List[Tuple[str, str]], formats: List[str] = None,
+                              deadline: float = None) -> List[Dict]:
+        formats = formats or ['markdown']
+        deadline = Deadline.coerce(deadline)
         
-        investor_results = []
-        for query in investor_queries:
-            results = self.web_search.search(query, max_results=5)
-            investor_results.extend(results)
-        
-        # Get social content for investment opinions
-        social_results = self.web_search.search_social_content(person_name)
+        print(f"⚡ Batch quick research for {len(entities)} entities")
         
-        # Analyze with investor focus
-        analysis = self.llm_analyzer.analyze_person_data(
-            person_name, vc_firm, investor_results
+        plans = [self.query_planner.quick_plan(person_name, company_name) for person_name, company_name in entities]
+        searches = self._run_stages(
+            {index: lambda plan=plan: self.web_search.run_plan(plan, deadline) for index, plan in enumerate(plans)},
+            deadline,
+            max_workers=Config.SEARCH_CONCURRENCY
         )
+        for index, plan in enumerate(plans):
+            if searches[index] is None:
+                plan.incomplete_groups.update(plan.groups())
+            else:
+                self._archive_corpus('quick', entities[index][0], entities[index][1], plan, searches[index])
+        searches = [searches[index] or {'person': [], 'company': []} for index in range(len(plans))]
+        dropped = [
+            self._disambiguate(results, ['person'], person_name, company_name)
+            for (person_name, company_name), results in zip(entities, searches)
+        ]
+        
+        print("🧠 Analyzing people and companies in shared requests...")
+        companies = {}
+        for index, (_, company_name) in enumerate(entities):
+            companies.setdefault(self.normalizer.company_key(company_name), index)
+        # Every report keeps its own tally and budget; batch_usage adds them up
+        usages = [TokenUsage(self.token_budget) for _ in entities]
+        batch_usage = TokenUsage()
+        for usage, results in zip(usages, searches):
+            self._fit_token_budget(usage, {'person': results['person'], 'company': results['company']})
+        
+        # The batch calls stop at the deadline themselves, returning None only for entities whose
+        # packed request was unfinished, so their finished output is not thrown away here
+        analyses = self._run_stages({
+            'person': lambda: self.llm_analyzer.analyze_person_data_batch([
+                {'name': person_name, 'company': company_name, 'search_results': results['person'], 'usage': usage}
+                for (person_name, company_name), results, usage in zip(entities, searches, usages)
+            ], deadline, batch_usage),
+            'company': lambda: self.llm_analyzer.analyze_company_data_batch([
+                {'company': entities[index][1], 'person_name': entities[index][0],
+                 'search_results': searches[index]['company'], 'usage': usages[index]}
+                for index in companies.values()
+            ], deadline, batch_usage)
+        }, Deadline.coerce(None))
+        for results in searches:
+            self._release_results(results)
+        person_analyses = analyses['person'] or [None] * len(entities)
+        # Every person at a company shares the analysis made from the first one's results
+        shared_analyses = dict(zip(companies, analyses['company'] or [None] * len(companies)))
+        company_analyses = []
+        for _, company_name in entities:
+            analysis = shared_analyses[self.normalizer.company_key(company_name)]
+            company_analyses.append(dict(analysis) if analysis else None)
+        
+        results = []
+        for (person_name, company_name), plan, person_analysis, company_analysis, entity_dropped, usage in zip(
+                entities, plans, person_analyses, company_analyses, dropped, usages):
+            person_analysis = person_analysis or self.llm_analyzer.incomplete_analysis('person')
+            company_analysis = company_analysis or self.llm_analyzer.incomplete_analysis('company')
+            self._mark_incomplete_searches(plan, {'person': person_analysis, 'company': company_analysis})
+            
+            reports = self.report_generator.render_quick_report(
+                person_name, company_name, person_analysis, company_analysis, formats
+            )
+            results.append({
+                'report': reports[formats[0]],
+                'reports': reports,
+                'raw_data': {
+                    'person': {'name': person_name, 'company': company_name, 'analysis': person_analysis},
+                    'company': {'name': company_name, 'analysis': company_analysis},
+                    'metadata': {'token_usage': usage.to_dict()}
+                },
+                'person_type': person_analysis.get('type', 'unknown'),
+                'company_type': company_analysis.get('type', 'unknown'),
+                'search_stats': plan.stats(),
+                'dropped_results': entity_dropped,
+                'token_usage': usage.to_dict(),
+                'mode': 'quick'
+            })
+        
+        if self.llm_analyzer.SPENDS_TOKENS:
+            # Shared requests are tallied in batch_usage and apportioned to the reports; add the rest
+            shared_requests = batch_usage.to_dict()['calls']
+            batch_total = TokenUsage()
+            for usage in usages:
+                batch_total.add(usage)
+            totals = batch_total.to_dict()
+            print(f"🪙 Batch used {totals['total_tokens']} Gemini tokens across {len(usages)} reports "
+                  f"({shared_requests} shared requests)")
+        print(f"✅ Batch research completed for {len(results)} entities")
+        return results
+    
+    def _canonical_names(self, person_name: str, company_name: str) -> Tuple[str, str]:
+        """One spelling per person and company, so equivalent names share searches and archive entries"""
+        return (self.normalizer.canonical('person', person_name),
+                self.normalizer.canonical('company', company_name))
+    
+    def _run_plan(self, plan: QueryPlan, deadline: Deadline = None) -> Dict[str, List[Dict]]:
+        """Execute a query plan and report how many searches it saved"""
+        results = self.web_search.run_plan(plan, deadline)
+        stats = plan.stats()
+        print(f"🔎 Executed {stats['executed']} of {stats['planned']} planned queries")
+        return results
+    
+    def _disambiguate(self, results: Dict[str, List[Dict]], groups: List[str], person_name: str,
+                      company_name: str, company_groups: List[str] = ()) -> List[Dict]:
+        """Drop results about namesakes from the person-centred groups before analysis
+        
+        Groups are filtered in order, and what an earlier group kept anchors the later
+        ones. Groups in company_groups also search the company on its own, so their
+        results about the company are kept even when they do not name the person.
+        Returns the dropped results, each tagged with its group and reason.
+        """
+        if not Config.DISAMBIGUATION_ENABLED:
+            return []
+        
+        confirmed, dropped = [], []
+        for group in groups:
+            kept, group_dropped = self.disambiguator.filter(
+                results[group], person_name, company_name, confirmed, keep_company_results=group in company_groups
+            )
+            results[group] = kept
+            confirmed = confirmed + kept
+            for entry in group_dropped:
+                entry['group'] = group
+            dropped.extend(group_dropped)
+        
+        if dropped:
+            print(f"🧹 Dropped {len(dropped)} results about other people named {person_name}")
+        return dropped
+    
+    def _archive_corpus(self, mode: str, person_name: str, company_name: str, plan: QueryPlan,
+                        results: Dict[str, List[Dict]]) -> None:
+        """Keep the raw search results so the run can be re-analyzed later without searching again"""
+        if self.corpus_archive is None:
+            return
+        try:
+            self.corpus_archive.append(mode, person_name, company_name, results, plan.group_queries(),
+                                       plan.incomplete_groups)
+        except Exception as e:
+            print(f"Error archiving search corpus: {e}")
+    
+    def _fit_token_budget(self, usage: TokenUsage, contexts: Dict[str, List[Dict]],
+                          optional: List[str] = ()) -> List[str]:
+        """Apply the report's token budget before its analyses run; returns the stages to skip"""
+        if not self.llm_analyzer.SPENDS_TOKENS:
+            return []
         
-        insights = self.llm_analyzer.extract_opinions_and_insights(
-            person_name, social_results
+        skipped = usage.fit(
+            {stage: self.llm_analyzer.estimate_context_tokens(results) for stage, results in contexts.items()},
+            Config.PROMPT_OVERHEAD_TOKENS,
+            optional
         )
+        if skipped:
+            print(f"🪙 Skipping {', '.join(skipped)} analysis to stay within the {usage.budget}-token budget")
+        return skipped
+    
+    def _release_results(self, results: Dict[str, List[Dict]]) -> None:
+        """Free page content the analyses have consumed; the results themselves still count as sources"""
+        for group_results in results.values():
+            for result in group_results:
+                if isinstance(result, SearchResult):
+                    result.release()
+    
+    def _run_stages(self, stages: Dict[str, Callable[[], Dict]], deadline: Deadline,
+                    max_workers: int = None) -> Dict[str, Dict]:
+        """Run independent stages concurrently; stages that miss the deadline come back as None"""
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(stages))
+        futures = {name: executor.submit(propagate(stage)) for name, stage in stages.items()}
+        try:
+            wait(list(futures.values()), timeout=deadline.remaining())
+            return {
+                name: future.result() if future.done() else None
+                for name, future in futures.items()
+            }
+        finally:
+            # Abandoned calls are bounded by the deadline-derived timeouts they were given
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def _mark_incomplete_searches(self, plan: QueryPlan, analyses: Dict[str, Dict]) -> None:
+        """Flag analyses built from searches that were cut short by the deadline"""
+        for group in plan.incomplete_groups:
+            if group in analyses:
+                analyses[group]['incomplete'] = True
+    
+    def research_investor_focus(self, person_name: str, vc_firm: str,
+                                formats: List[str] = None, deadline: float = None) -> Dict:
+        """Specialized research for VCs and investors"""
+        formats = formats or ['markdown']
+        deadline = Deadline.coerce(deadline)
+        
+        print(f"💼 Researching investor {person_name} at {vc_firm}")
+        
+        # Investor-specific searches and social content for investment opinions, as one batch
+        plan = self.query_planner.investor_plan(person_name, vc_firm)
+        results = self._run_plan(plan, deadline)
+        self._archive_corpus('investor', person_name, vc_firm, plan, results)
+        
+        return self._analyze_investor(person_name, vc_firm, plan, results, formats, deadline)
+    
+    def _analyze_investor(self, person_name: str, vc_firm: str, plan: QueryPlan, results: Dict[str, List[Dict]],
+                          formats: List[str], deadline: Deadline) -> Dict:
+        """Analysis and report steps of investor research, on search results already in hand"""
+        # Half of the investor queries are about the firm alone ("<firm> portfolio companies")
+        dropped = self._disambiguate(results, ['investor', 'social'], person_name, vc_firm,
+                                     company_groups=['investor'])
+        investor_results = results['investor']
+        social_results = results['social']
+        
+        # Analyze with investor focus
+        usage = TokenUsage(self.token_budget)
+        # The investor analysis runs as the 'person' stage of the analyzer
+        skipped = self._fit_token_budget(usage, {'person': investor_results, 'social': social_results},
+                                         optional=['social'])
+        stages = {
+            'investor': lambda: self.llm_analyzer.analyze_person_data(
+                person_name, vc_firm, investor_results, deadline, usage
+            ),
+            'social': lambda: self.llm_analyzer.extract_opinions_and_insights(
+                person_name, social_results, deadline, usage
+            )
+        }
+        analyses = self._run_stages({name: stage for name, stage in stages.items() if name not in skipped}, deadline)
+        analysis = analyses['investor'] or self.llm_analyzer.incomplete_analysis('investor')
+        if 'social' in skipped:
+            insights = self.llm_analyzer.skipped_insights()
+        else:
+            insights = analyses['social'] or self.llm_analyzer.incomplete_insights()
+        self._mark_incomplete_searches(plan, {'investor': analysis, 'social': insights})
+        self._release_results(results)
         
         # Generate investor-focused report
-        report = self.report_generator.generate_investor_report(
-            person_name, vc_firm, analysis, insights
+        reports = self.report_generator.render_investor_report(
+            person_name, vc_firm, analysis, insights, formats
         )
         
         return {
-            'report': report,
+            'report': reports[formats[0]],
+            'reports': reports,
+            'raw_data': {
+                'person': {'name': person_name, 'company': vc_firm, 'analysis': analysis},
+                'insights': insights,
+                'metadata': {'token_usage': usage.to_dict()}
+            },
+            'person_type': analysis.get('type', 'unknown'),
+            'search_stats': plan.stats(),
+            'dropped_results': dropped,
+            'token_usage': usage.to_dict(),
             'investment_focus': analysis.get('analysis', ''),
             'opinions': insights.get('insights', '')
         }
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Peak RSS of a large synthetic batch with plain result dicts vs SearchResult
+
+Each variant runs in its own subprocess, since peak RSS never goes down:
+
+    python benchmarks/memory_benchmark.py --entities 2000 --results 15
+
+Page content is cut from real prose, since compressed sizes depend on it: the
+page bodies in a recorded Jina cassette (--cassette, as written by main.py --record) or, by
+default, the repository's README.
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.search_result import SearchResult
+from utils.transport import read_cassette
+
+DOMAINS = ['techcrunch.com', 'linkedin.com', 'crunchbase.com', 'twitter.com', 'medium.com',
+           'forbes.com', 'bloomberg.com', 'substack.com']
+
+
+def load_prose(cassette: str = None) -> str:
+    """Text to cut page content from: a cassette's Jina page bodies, or the README"""
+    if cassette:
+        pages = [entry['body'] for entry in read_cassette(cassette)
+                 if entry.get('kind') == 'jina' and isinstance(entry.get('body'), str)]
+        if not pages:
+            sys.exit(f"No Jina page bodies in {cassette}")
+        return '\n\n'.join(pages)
+
+    with open(os.path.join(ROOT, 'README.md'), encoding='utf-8') as f:
+        return f.read()
+
+
+def synthetic_results(entity: int, count: int, content_chars: int, prose: str, rng: random.Random):
+    """Search results as the parsers see them: title, URL, snippet and page content"""
+    for number in range(count):
+        domain = DOMAINS[rng.randrange(len(DOMAINS))]
+        start = rng.randrange(max(len(prose) - content_chars, 1))
+        content = prose[start:start + content_chars]
+        yield {
+            'title': f"Entity {entity} result {number}",
+            'url': f"https://www.{domain}/entity-{entity}/article-{number % 5}",
+            'content': content,
+            'snippet': content[:200]
+        }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_variant(variant: str, entities: int, results: int, content_chars: int, cassette: str = None) -> None:
+    """Keep every entity's results alive until the batch is done, as batch research does"""
+    rng = random.Random(42)
+    prose = load_prose(cassette)
+    batch = []
+    consumed = 0
+    for entity in range(entities):
+        raw = synthetic_results(entity, results, content_chars, prose, rng)
+        if variant == 'dict':
+            entity_results = [dict(result) for result in raw]
+        else:
+            entity_results = [SearchResult.from_dict(result) for result in raw]
+
+        # Analysis reads every result once; the release variant then drops the content
+        for result in entity_results:
+            consumed += len(result.get('content', ''))
+        if variant == 'compact-release':
+            for result in entity_results:
+                result.release()
+        batch.append(entity_results)
+
+    print(f"{variant:16s} {peak_rss_mb():10.1f} MB peak RSS  ({consumed / 1e6:.1f} MB of content read)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entities', type=int, default=1000)
+    parser.add_argument('--results', type=int, default=15, help='Results per entity')
+    parser.add_argument('--content-chars', type=int, default=4000, help='Page content per result')
+    parser.add_argument('--cassette', help='Recorded cassette whose Jina page bodies supply the content')
+    parser.add_argument('--variant', choices=['dict', 'compact', 'compact-release'],
+                        help='Run a single variant in this process')
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.entities, args.results, args.content_chars, args.cassette)
+        return
+
+    prose = load_prose(args.cassette).encode('utf-8')
+    ratio = len(prose) / len(zlib.compress(prose, 1))
+    print(f"{args.entities} entities x {args.results} results x {args.content_chars} chars "
+          f"from {args.cassette or 'README.md'} (zlib level 1 ratio {ratio:.1f}x)")
+    for variant in ('dict', 'compact', 'compact-release'):
+        command = [
+            sys.executable, os.path.abspath(__file__), '--variant', variant,
+            '--entities', str(args.entities), '--results', str(args.results),
+            '--content-chars', str(args.content_chars)
+        ]
+        if args.cassette:
+            command += ['--cassette', args.cassette]
+        subprocess.run(command, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,22 +9,124 @@ class Config:
     JINA_API_KEY = os.getenv("JINA_API_KEY")
     GROK_API_KEY = os.getenv("GROK_API_KEY")
     
+    # Key pools: comma-separated GEMINI_API_KEYS / JINA_API_KEYS, or the single keys above
+    GEMINI_API_KEYS = [key.strip() for key in (os.getenv("GEMINI_API_KEYS") or GEMINI_API_KEY or "").split(",") if key.strip()]
+    JINA_API_KEYS = [key.strip() for key in (os.getenv("JINA_API_KEYS") or JINA_API_KEY or "").split(",") if key.strip()]
+    GEMINI_API_KEY = GEMINI_API_KEY or next(iter(GEMINI_API_KEYS), None)
+    JINA_API_KEY = JINA_API_KEY or next(iter(JINA_API_KEYS), None)
+    
+    # Requests per minute each key may send (None: no local limit, rely on the provider's 429s)
+    KEY_REQUESTS_PER_MINUTE = {
+        'gemini': int(os.getenv("GEMINI_KEY_RPM")) if os.getenv("GEMINI_KEY_RPM") else None,
+        'jina': int(os.getenv("JINA_KEY_RPM")) if os.getenv("JINA_KEY_RPM") else None
+    }
+    # A key answered with 429 rests this long, doubling on repeated 429s up to the maximum
+    KEY_COOLDOWN_SECONDS = 30
+    KEY_MAX_COOLDOWN_SECONDS = 600
+    
     # API Endpoints
     JINA_SEARCH_URL = "https://s.jina.ai/"
+    JINA_READER_URL = "https://r.jina.ai/"
     GROK_API_URL = "https://api.x.ai/v1"
     
     # Search Settings
     MAX_SEARCH_RESULTS = 10
     MAX_SOCIAL_RESULTS = 5
     
+    SEARCH_CONCURRENCY = 4
+    
+    # Interactive mode starts person and company searches while the user is still typing
+    SPECULATIVE_PREFETCH = True
+    
+    # Identical searches share one request while in flight, and reuse its results for a while after
+    SEARCH_CACHE_SECONDS = 600
+    SEARCH_CACHE_ENTRIES = 256  # 0 turns the cache off; in-flight searches are still shared
+    
+    # Alias table mapping other names of people and companies to a canonical one (optional JSON file)
+    ENTITY_ALIASES_PATH = os.getenv("ENTITY_ALIASES_PATH", "entity_aliases.json")
+    
+    # Outbound calls in flight at once per service, shared by every run in the process. Free slots go
+    # to waiting priority classes by weighted round robin, so interactive calls overtake batch calls
+    SCHEDULER_SLOTS = {'jina': 8, 'gemini': 4}
+    SCHEDULER_WEIGHTS = {'interactive': 8, 'batch': 1}
+    SCHEDULER_WAIT_SAMPLES = 1000
+    
+    # Upper bound for any single HTTP or LLM call, in seconds, even without a run deadline
+    HTTP_TIMEOUT = 30
+    LLM_TIMEOUT = 60
+    
+    # Two-phase search: fetch titles/URLs/snippets first, then full content for the top results only
+    TWO_PHASE_SEARCH = True
+    MAX_CONTENT_FETCHES = 5
+    MAX_PAGE_BYTES = 20000
+    
+    # Quick mode stops searching once it has this many unique relevant sources per entity
+    QUICK_MAX_SOURCES = 3
+    QUICK_RESULTS_PER_QUERY = 3
+    
+    # Drop results about namesakes before analysis: results naming the person but not the company
+    # are kept only if their hashed n-gram vector is this similar to the confirmed results
+    DISAMBIGUATION_ENABLED = True
+    DISAMBIGUATION_THRESHOLD = 0.1
+    DISAMBIGUATION_HASH_BITS = 13
+    DISAMBIGUATION_MAX_CHARS = 4000
+    
+    # Analyzer backend: "gemini", "local" (extractive, no LLM) or "auto" (Gemini with local fallback)
+    ANALYZER_BACKEND = os.getenv("ANALYZER_BACKEND", "gemini")
+    LOCAL_SENTENCES_PER_SECTION = 3
+    LOCAL_MAX_SENTENCES = 600
+    LOCAL_MAX_VOCABULARY = 3000
+    
+    # Gemini models in order of preference. Each call goes to the first healthy model whose recent
+    # p95 latency, for prompts of that size, fits the latency target of the call's priority class
+    GEMINI_MODELS = [name.strip() for name in os.getenv("GEMINI_MODELS", "gemini-1.5-flash,gemini-1.5-pro").split(",")
+                     if name.strip()]
+    # Preference for prompts of ROUTER_LARGE_PROMPT_TOKENS or more (full reports, packed batches),
+    # which gain most from the stronger model
+    GEMINI_LARGE_PROMPT_MODELS = [
+        name.strip() for name in os.getenv("GEMINI_LARGE_PROMPT_MODELS", "gemini-1.5-pro,gemini-1.5-flash").split(",")
+        if name.strip()
+    ]
+    ROUTER_LATENCY_TARGETS = {'interactive': 20.0, 'batch': 60.0}
+    ROUTER_WINDOW_SECONDS = 300  # Latency and error samples older than this are forgotten
+    ROUTER_MIN_SAMPLES = 5
+    ROUTER_MAX_ERROR_RATE = 0.5  # Over the model's last ROUTER_ERROR_SAMPLES calls
+    ROUTER_ERROR_SAMPLES = 20
+    ROUTER_LARGE_PROMPT_TOKENS = 8000
+    # Hedged requests: when the first model has not answered by its p95 latency, ask a second one too
+    HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+    
+    # Cross-entity batching: several entities share one Gemini request in batch runs
+    BATCH_PROMPT_TOKEN_LIMIT = 30000
+    BATCH_MAX_ENTITIES = 8
+    BATCH_MAX_OUTPUT_TOKENS = 8192
+    BATCH_MIN_OUTPUT_CHARS = 40
+    
+    # Token accounting: a report's Gemini budget (input + output tokens, unset = unlimited) and the
+    # most search context one call may send. Over budget, social insights are skipped, then context trimmed
+    RUN_TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET")) if os.getenv("RUN_TOKEN_BUDGET") else None
+    MAX_CONTEXT_TOKENS = 30000
+    MIN_CONTEXT_TOKENS = 500
+    # Per-call cost besides the search context: instructions plus the output allowance
+    PROMPT_OVERHEAD_TOKENS = 2500
+    
     # Report Settings
     REPORT_TEMPLATE_PATH = "templates/"
     OUTPUT_PATH = "reports/"
+    ARCHIVE_PATH = "reports/archive.db"
+    
+    # Raw search corpus archive, for re-analysis without searching again
+    CORPUS_ARCHIVE = os.getenv('CORPUS_ARCHIVE', 'true').lower() != 'false'
+    CORPUS_PATH = "reports/corpus/"
+    CORPUS_SEGMENT_BYTES = 64 * 1024 * 1024
+    CORPUS_OPEN_SEGMENTS = 4  # Segments kept memory-mapped at once
     
     @classmethod
-    def validate(cls):
+    def validate(cls, require_gemini: bool = True):
         """Validate that all required API keys are present"""
-        required_keys = [cls.GEMINI_API_KEY, cls.JINA_API_KEY]
+        required_keys = [cls.JINA_API_KEY]
+        if require_gemini:
+            required_keys.append(cls.GEMINI_API_KEY)
         missing_keys = [key for key in required_keys if not key]
         
         if missing_keys:
@@ -1,7 +1,285 @@
 import sys
+import csv
 import argparse
+from datetime import datetime, timedelta
 from config import Config
 from agents.research_agent import ResearchAgent
+from utils.corpus_archive import CorpusArchive
+from utils.key_pool import key_pool_stats
+from utils.report_archive import ReportArchive
+from utils.report_generator import FORMAT_EXTENSIONS
+from utils.scheduler import PRIORITY_CLASSES, scheduler_stats, scheduling_priority
+from utils.transport import RecordingTransport, ReplayTransport
+
+def archive_report(result, person_name, company_name, output_format='markdown'):
+    """Store a research result in the report archive and return its id"""
+    try:
+        archive = ReportArchive()
+        return archive.save(
+            result['report'], person_name, company_name, result.get('mode', 'full'),
+            processed_data=result.get('raw_data'),
+            output_format=output_format,
+            person_type=result.get('person_type'),
+            company_type=result.get('company_type')
+        )
+    except Exception as e:
+        print(f"Error archiving report: {e}")
+        return None
+
+def find_recent_report(person_name, company_name, mode, max_age_days):
+    """Return the latest archived report if it is recent enough"""
+    try:
+        cached = ReportArchive().latest(person_name, company_name, mode)
+    except Exception as e:
+        print(f"Error reading report archive: {e}")
+        return None
+    
+    if cached and datetime.fromisoformat(cached['created_at']) >= datetime.now() - timedelta(days=max_age_days):
+        if is_partial_report(cached.get('data')):
+            print(f"⏱️  Archived report #{cached['id']} was cut short by the deadline; researching again")
+            return None
+        return cached
+    return None
+
+def is_partial_report(data):
+    """Whether an archived report's data marks any section incomplete, in any research mode"""
+    if not data:
+        return False
+    if data.get('metadata', {}).get('incomplete_sections'):
+        return True
+    for section in ('person', 'company', 'insights'):
+        part = data.get(section) or {}
+        analysis = part.get('analysis')
+        if part.get('incomplete') or (isinstance(analysis, dict) and analysis.get('incomplete')):
+            return True
+    return False
+
+def search_reports_command(argv):
+    """Search archived reports before paying for a new research run"""
+    parser = argparse.ArgumentParser(prog='main.py search-reports',
+                                     description='Full-text search over archived research reports')
+    parser.add_argument('query', help='Search terms (person, company, topics...)')
+    parser.add_argument('--person-type', choices=['investor', 'founder', 'executive', 'professional', 'unknown'],
+                       help='Only show reports about this type of person')
+    parser.add_argument('--company-type', choices=['vc_firm', 'startup', 'company', 'unknown'],
+                       help='Only show reports about this type of company')
+    parser.add_argument('--max-age-days', type=float, help='Only show reports newer than this many days')
+    parser.add_argument('--limit', '-n', type=int, default=10, help='Maximum number of results (default: 10)')
+    parser.add_argument('--show', action='store_true', help='Print the full text of the best match')
+    
+    args = parser.parse_args(argv)
+    
+    archive = ReportArchive()
+    results = archive.search(
+        args.query, person_type=args.person_type, company_type=args.company_type,
+        max_age_days=args.max_age_days, limit=args.limit
+    )
+    
+    if not results:
+        print("🔎 No archived reports found.")
+        return
+    
+    print(f"🔎 {len(results)} archived report(s) for '{args.query}':")
+    for result in results:
+        print(f"\n#{result['id']} {result['person']} at {result['company']} "
+              f"({result['mode']}, {result['created_at'][:16]}, score {result['score']:.2f})")
+        print(f"   Person type: {result.get('person_type') or 'unknown'} | "
+              f"Company type: {result.get('company_type') or 'unknown'}")
+        print(f"   {result['snippet']}")
+    
+    if args.show:
+        print("\n" + "-" * 50)
+        print(archive.get(results[0]['id'])['report'])
+
+def add_transport_arguments(parser):
+    """Options for recording live Jina/Gemini exchanges or replaying them offline"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record', metavar='CASSETTE',
+                       help='Record every Jina and Gemini exchange to this cassette file (.jsonl.gz)')
+    group.add_argument('--replay', metavar='CASSETTE',
+                       help='Answer Jina and Gemini requests from a recorded cassette, without network access')
+    parser.add_argument('--replay-realtime', action='store_true',
+                       help='With --replay, wait as long as each recorded call took instead of answering at once')
+
+def create_transport(args):
+    """Transport for the run: recording, replaying, or live (None)"""
+    if args.replay:
+        return ReplayTransport(args.replay, realtime=args.replay_realtime)
+    if args.record:
+        return RecordingTransport(args.record)
+    return None
+
+def print_scheduler_stats():
+    """Queue depth and wait times of the outbound call schedulers"""
+    for service, stats in scheduler_stats().items():
+        waits = ', '.join(
+            f"{priority} p95 {counts['wait_p95']:.2f}s (max queue {counts['max_queued']})"
+            for priority, counts in stats['classes'].items() if counts['granted']
+        )
+        print(f"⏳ {service}: {waits or 'no calls'}")
+
+def print_key_pool_stats():
+    """Requests and rate limits per API key, for pools of more than one key"""
+    for service, keys in key_pool_stats().items():
+        if len(keys) < 2:
+            continue
+        usage = ', '.join(
+            f"{label} {counts['requests']} requests" + (f" ({counts['rate_limited']} rate limited)"
+                                                        if counts['rate_limited'] else "")
+            for label, counts in keys.items()
+        )
+        print(f"🔑 {service}: {usage}")
+
+def print_model_stats(analyzer):
+    """Calls and latency per Gemini model, as seen by the model router"""
+    router = getattr(analyzer, 'router', None)
+    if router is None:
+        return
+    stats = router.stats()
+    usage = ', '.join(
+        f"{model} {counts['calls']} calls"
+        + (f", p95 {counts['p95']:.1f}s" if counts['p95'] is not None else "")
+        + (f" ({counts['errors']} errors)" if counts['errors'] else "")
+        for model, counts in stats['models'].items() if counts['calls']
+    )
+    if usage:
+        hedging = f"; {stats['hedged']} hedged, {stats['hedge_wins']} won by the hedge" if stats['hedged'] else ""
+        print(f"🧭 Models: {usage}{hedging}")
+
+def batch_command(argv):
+    """Quick research for every person/company pair in a CSV file"""
+    parser = argparse.ArgumentParser(prog='main.py batch',
+                                     description='Quick research for many people, sharing Gemini requests between them')
+    parser.add_argument('file', help='CSV file with person and company columns')
+    parser.add_argument('--format', '-f', choices=['markdown', 'html', 'json'],
+                       default='markdown', help='Report output format (default: markdown)')
+    parser.add_argument('--analyzer', '-a', choices=['gemini', 'local', 'auto'],
+                       default=Config.ANALYZER_BACKEND, help='Analysis backend (default: %(default)s)')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                       help='Time budget for the whole batch; unfinished sections are marked incomplete')
+    parser.add_argument('--token-budget', type=int, metavar='TOKENS',
+                       help='Gemini tokens each report may use; over budget, context is trimmed')
+    parser.add_argument('--priority', choices=PRIORITY_CLASSES, default='batch',
+                       help='Scheduling priority of the outbound calls (default: batch)')
+    parser.add_argument('--save', '-s', action='store_true', help='Save every report to the report archive')
+    parser.add_argument('--export', '-e', action='store_true', help='Also write every report to a file in reports/')
+    add_transport_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        with open(args.file, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+    except OSError as e:
+        print(f"❌ Cannot read {args.file}: {e}")
+        sys.exit(1)
+    
+    if rows and [cell.strip().lower() for cell in rows[0][:2]] == ['person', 'company']:
+        rows = rows[1:]
+    entities = [(row[0].strip(), row[1].strip()) for row in rows if len(row) >= 2 and row[0].strip() and row[1].strip()]
+    if not entities:
+        print("❌ No person,company rows found")
+        sys.exit(1)
+    
+    try:
+        if not args.replay:
+            Config.validate(require_gemini=args.analyzer != 'local')
+    except ValueError as e:
+        print(f"❌ Configuration Error: {e}")
+        print("Please check your .env file and API keys.")
+        sys.exit(1)
+    
+    agent = ResearchAgent(args.analyzer, create_transport(args), args.token_budget)
+    try:
+        results = agent.batch_quick_research(entities, [args.format], deadline=args.deadline,
+                                             priority=args.priority)
+    finally:
+        agent.transport.close()
+    print_scheduler_stats()
+    print_key_pool_stats()
+    print_model_stats(agent.llm_analyzer)
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    for number, ((person_name, company_name), result) in enumerate(zip(entities, results), 1):
+        print(f"\n👤 {person_name} at {company_name}: "
+              f"{result.get('person_type', 'unknown')} / {result.get('company_type', 'unknown')}, "
+              f"{result['token_usage']['total_tokens']} tokens")
+        
+        if args.save:
+            report_id = archive_report(result, person_name, company_name, args.format)
+            if report_id:
+                print(f"   🗄️  Archived as #{report_id}")
+        
+        if args.export:
+            slug = '_'.join(person_name.lower().split())
+            filename = f"research_report_{timestamp}_{number:03d}_{slug}.{FORMAT_EXTENSIONS[args.format]}"
+            filepath = agent.report_generator.save_report(result['report'], filename, args.format)
+            if filepath:
+                print(f"   💾 Saved to: {filepath}")
+
+def reanalyze_command(argv):
+    """Analyze archived search corpora again, without new searches"""
+    parser = argparse.ArgumentParser(prog='main.py reanalyze',
+                                     description='Re-run analysis and reports on archived search results')
+    parser.add_argument('--person', '-p', help='Only corpora about this person')
+    parser.add_argument('--company', '-c', help='Only corpora about this company')
+    parser.add_argument('--mode', '-m', choices=['full', 'quick', 'investor'], help='Only corpora of this research mode')
+    parser.add_argument('--max-age-days', type=float, help='Only corpora newer than this many days')
+    parser.add_argument('--limit', '-n', type=int, help='Maximum number of corpora to re-analyze')
+    parser.add_argument('--include-incomplete', action='store_true',
+                       help='Also re-analyze corpora whose searches were cut short by the deadline')
+    parser.add_argument('--format', '-f', choices=['markdown', 'html', 'json'],
+                       default='markdown', help='Report output format (default: markdown)')
+    parser.add_argument('--analyzer', '-a', choices=['gemini', 'local', 'auto'],
+                       default=Config.ANALYZER_BACKEND, help='Analysis backend (default: %(default)s)')
+    parser.add_argument('--token-budget', type=int, metavar='TOKENS',
+                       help='Gemini tokens each report may use; over budget, context is trimmed')
+    parser.add_argument('--save', '-s', action='store_true', help='Save every report to the report archive')
+    parser.add_argument('--export', '-e', action='store_true', help='Also write every report to a file in reports/')
+    
+    args = parser.parse_args(argv)
+    
+    if args.analyzer != 'local' and not Config.GEMINI_API_KEY:
+        print("❌ Configuration Error: GEMINI_API_KEY is required unless --analyzer local is used")
+        sys.exit(1)
+    
+    archive = CorpusArchive()
+    runs = archive.runs(person=args.person, company=args.company, mode=args.mode,
+                        max_age_days=args.max_age_days, limit=args.limit,
+                        complete_only=not args.include_incomplete)
+    if not runs:
+        print("🔎 No archived search corpora found.")
+        if not args.include_incomplete:
+            print("   Corpora cut short by the deadline are skipped; add --include-incomplete to use them.")
+        return
+    
+    agent = ResearchAgent(args.analyzer, token_budget=args.token_budget)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    # One corpus in memory at a time: each is loaded, analyzed and dropped before the next
+    for run in runs:
+        corpus = archive.load(run['id'])
+        if corpus['incomplete_groups']:
+            print(f"⏱️  Corpus #{corpus['id']} was cut short by the deadline "
+                  f"({', '.join(corpus['incomplete_groups'])}); those sections stay marked incomplete")
+        result = agent.reanalyze(corpus, [args.format])
+        print(f"👤 {corpus['person']} at {corpus['company']} ({corpus['mode']}, searched {corpus['created_at'][:16]}): "
+              f"{result['token_usage']['total_tokens']} tokens")
+        
+        if args.save:
+            report_id = archive_report(result, corpus['person'], corpus['company'], args.format)
+            if report_id:
+                print(f"   🗄️  Archived as #{report_id}")
+        
+        if args.export:
+            slug = '_'.join(corpus['person'].lower().split())
+            filename = f"research_report_{timestamp}_corpus{corpus['id']}_{slug}.{FORMAT_EXTENSIONS[args.format]}"
+            filepath = agent.report_generator.save_report(result['report'], filename, args.format)
+            if filepath:
+                print(f"   💾 Saved to: {filepath}")
+        
+        if not (args.save or args.export):
+            print(result['report'])
+    archive.close()
 
 def main():
     parser = argparse.ArgumentParser(description='AI Research Agent for Person and Company Analysis')
@@ -9,48 +287,83 @@ def main():
     parser.add_argument('--company', '-c', required=True, help='Company name or website')
     parser.add_argument('--mode', '-m', choices=['full', 'quick', 'investor'], 
                        default='full', help='Research mode (default: full)')
-    parser.add_argument('--save', '-s', action='store_true', help='Save report to file')
-    parser.add_argument('--output', '-o', help='Output filename (optional)')
+    parser.add_argument('--format', '-f', choices=['markdown', 'html', 'json'],
+                       default='markdown', help='Report output format (default: markdown)')
+    parser.add_argument('--analyzer', '-a', choices=['gemini', 'local', 'auto'],
+                       default=Config.ANALYZER_BACKEND,
+                       help='Analysis backend: Gemini, local extractive summaries, or Gemini with local fallback')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                       help='Time budget for the whole run; unfinished sections are marked incomplete')
+    parser.add_argument('--token-budget', type=int, metavar='TOKENS',
+                       help='Gemini tokens the report may use; over budget, social insights are skipped and context trimmed')
+    parser.add_argument('--priority', choices=PRIORITY_CLASSES, default='interactive',
+                       help='Scheduling priority of the outbound calls, e.g. batch for background refreshes')
+    parser.add_argument('--reuse-days', type=float,
+                       help='Reuse an archived report for this person and company if it is newer than this many days')
+    parser.add_argument('--save', '-s', action='store_true', help='Save report to the report archive')
+    parser.add_argument('--export', '-e', action='store_true', help='Also write the report to a file in reports/')
+    parser.add_argument('--output', '-o', help='Output filename for --export (optional, implies --export)')
+    add_transport_arguments(parser)
     
     args = parser.parse_args()
     
     try:
-        # Validate configuration
-        Config.validate()
+        # Reuse a recent archived report instead of running new searches
+        if args.reuse_days is not None:
+            cached = find_recent_report(args.person, args.company, args.mode, args.reuse_days)
+            if cached:
+                print(f"♻️  Using archived report #{cached['id']} from {cached['created_at']}")
+                print(cached['report'])
+                return
+        
+        # Validate configuration (a replayed run needs no API keys)
+        if not args.replay:
+            Config.validate(require_gemini=args.analyzer != 'local')
         
         # Initialize agent
-        agent = ResearchAgent()
+        agent = ResearchAgent(args.analyzer, create_transport(args), args.token_budget)
         
         print(f"🤖 AI Research Agent Starting...")
         print(f"📝 Person: {args.person}")
         print(f"🏢 Company: {args.company}")
         print(f"⚙️  Mode: {args.mode}")
+        if args.deadline:
+            print(f"⏱️  Deadline: {args.deadline:g}s")
         print("-" * 50)
         
         # Execute research based on mode
-        if args.mode == 'quick':
-            report = agent.quick_research(args.person, args.company)
-            print(report)
-            
-        elif args.mode == 'investor':
-            result = agent.research_investor_focus(args.person, args.company)
-            print(result['report'])
-            
-        else:  # full mode
-            result = agent.research_person_and_company(args.person, args.company)
-            report = result['report']
-            print(report)
-            
+        try:
+            with scheduling_priority(args.priority):
+                result = agent.run(args.mode, args.person, args.company, [args.format], deadline=args.deadline)
+        finally:
+            agent.transport.close()
+        report = result['report']
+        print(report)
+        
+        if args.mode == 'full':
             # Show additional info for full mode
             print(f"\n📊 Research Summary:")
             print(f"- Person Type: {result.get('person_type', 'Unknown')}")
             print(f"- Company Type: {result.get('company_type', 'Unknown')}")
         
-        # Save report if requested
+        usage = result.get('token_usage')
+        if usage and usage['calls']:
+            print(f"🪙 Gemini tokens: {usage['input_tokens']} in + {usage['output_tokens']} out "
+                  f"= {usage['total_tokens']}" + (f" (budget {usage['budget']})" if usage['budget'] else ""))
+        
+        # Archive report if requested
         if args.save:
+            report_id = archive_report(result, args.person, args.company, args.format)
+            if report_id:
+                print(f"\n🗄️  Report archived as #{report_id}")
+            else:
+                print("\n❌ Failed to archive report")
+        
+        # Export report file if requested
+        if args.export or args.output:
             from utils.report_generator import ReportGenerator
             generator = ReportGenerator()
-            filepath = generator.save_report(report, args.output)
+            filepath = generator.save_report(report, args.output, args.format)
             if filepath:
                 print(f"\n💾 Report saved to: {filepath}")
             else:
@@ -74,14 +387,18 @@ def interactive_mode():
     print("🤖 AI Research Agent - Interactive Mode")
     print("=" * 50)
     
+    agent = None
     try:
-        Config.validate()
+        Config.validate(require_gemini=Config.ANALYZER_BACKEND != 'local')
         agent = ResearchAgent()
         
         while True:
             print("\n" + "-" * 30)
             person_name = input("👤 Enter person name (or 'quit' to exit): ").strip()
             
+            # A new entry replaces whatever was being prefetched for the previous one
+            agent.cancel_prefetch()
+            
             if person_name.lower() in ['quit', 'exit', 'q']:
                 print("👋 Goodbye!")
                 break
@@ -89,11 +406,23 @@ def interactive_mode():
             if not person_name:
                 print("❌ Person name cannot be empty")
                 continue
+            
+            agent.prefetch_person(person_name)
+            
+            # Point out existing material before paying for a new run
+            previous = ReportArchive().search(person_name, limit=3)
+            if previous:
+                print(f"📚 Found {len(previous)} archived report(s) mentioning {person_name}:")
+                for hit in previous:
+                    print(f"   #{hit['id']} {hit['person']} at {hit['company']} ({hit['mode']}, {hit['created_at'][:10]})")
+                print("   Use 'python main.py search-reports' to read them.")
                 
             company_name = input("🏢 Enter company name: ").strip()
             if not company_name:
                 print("❌ Company name cannot be empty")
                 continue
+            
+            agent.prefetch_company(person_name, company_name)
                 
             print("\n📋 Research modes:")
             print("1. Full Research (comprehensive)")
@@ -111,25 +440,17 @@ def interactive_mode():
             print("-" * 50)
             
             try:
-                if mode == 'quick':
-                    report = agent.quick_research(person_name, company_name)
-                elif mode == 'investor':
-                    result = agent.research_investor_focus(person_name, company_name)
-                    report = result['report']
-                else:
-                    result = agent.research_person_and_company(person_name, company_name)
-                    report = result['report']
+                result = agent.run(mode, person_name, company_name)
+                report = result['report']
                 
                 print(report)
                 
                 # Ask if user wants to save
-                save_choice = input("\n💾 Save report to file? (y/n): ").strip().lower()
+                save_choice = input("\n💾 Save report to archive? (y/n): ").strip().lower()
                 if save_choice in ['y', 'yes']:
-                    from utils.report_generator import ReportGenerator
-                    generator = ReportGenerator()
-                    filepath = generator.save_report(report)
-                    if filepath:
-                        print(f"✅ Report saved to: {filepath}")
+                    report_id = archive_report(result, person_name, company_name)
+                    if report_id:
+                        print(f"✅ Report archived as #{report_id}")
                 
             except Exception as e:
                 print(f"❌ Research error: {e}")
@@ -139,11 +460,20 @@ def interactive_mode():
         print("Please check your .env file and API keys.")
     except KeyboardInterrupt:
         print("\n👋 Goodbye!")
+    finally:
+        if agent is not None:
+            agent.web_search.close()
 
 if __name__ == "__main__":
     if len(sys.argv) == 1:
         # No arguments provided, start interactive mode
         interactive_mode()
+    elif sys.argv[1] == 'search-reports':
+        search_reports_command(sys.argv[2:])
+    elif sys.argv[1] == 'batch':
+        batch_command(sys.argv[2:])
+    elif sys.argv[1] == 'reanalyze':
+        reanalyze_command(sys.argv[2:])
     else:
         # Arguments provided, use CLI mode
         main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+from typing import List, Dict, Optional
+from config import Config
+from utils.deadline import Deadline
+from utils.token_usage import TokenUsage, estimate_tokens
+
+
+class AnalyzerBase:
+    """Helpers shared by the Gemini and local analyzer backends"""
+    
+    # Whether analyses cost LLM tokens, so token budgets apply
+    SPENDS_TOKENS = False
+    
+    def analyze_person_data_batch(self, entities: List[Dict], deadline: Deadline = None,
+                                  usage: TokenUsage = None) -> List[Dict]:
+        """Analyze several people; backends without request batching analyze them one by one"""
+        return [
+            self.analyze_person_data(
+                entity['name'], entity['company'], entity['search_results'], deadline, entity.get('usage')
+            )
+            for entity in entities
+        ]
+    
+    def analyze_company_data_batch(self, entities: List[Dict], deadline: Deadline = None,
+                                   usage: TokenUsage = None) -> List[Dict]:
+        """Analyze several companies; backends without request batching analyze them one by one"""
+        return [
+            self.analyze_company_data(
+                entity['company'], entity['search_results'], entity.get('person_name'), deadline,
+                entity.get('usage')
+            )
+            for entity in entities
+        ]
+    
+    def estimate_context_tokens(self, results: List[Dict]) -> int:
+        """Estimated tokens the results would add to a prompt"""
+        return estimate_tokens(self._combine_search_results(results))
+    
+    def incomplete_analysis(self, subject: str) -> Dict:
+        """Placeholder analysis for a stage cut off by the deadline"""
+        return {
+            'analysis': f"The {subject} analysis did not finish before the deadline.",
+            'type': 'unknown',
+            'incomplete': True
+        }
+    
+    def incomplete_insights(self) -> Dict:
+        """Placeholder insights for a stage cut off by the deadline"""
+        return {
+            'insights': "Social content analysis did not finish before the deadline.",
+            'incomplete': True
+        }
+    
+    def skipped_insights(self) -> Dict:
+        """Placeholder insights for a stage skipped to stay within the token budget"""
+        return {
+            'insights': "Social content analysis was skipped to stay within the token budget.",
+            'skipped': True
+        }
+    
+    def _combine_search_results(self, results: List[Dict], max_tokens: int = None) -> str:
+        """Combine search results into a single text block
+        
+        With max_tokens, results are kept in order until the estimate reaches the
+        limit; the last one that fits only partly is cut short.
+        """
+        combined = ""
+        for result in results:
+            title = result.get('title', '')
+            content = result.get('content', '')
+            url = result.get('url', '')
+            
+            if max_tokens is not None:
+                room = max_tokens * 4 - len(combined) - len(title) - len(url) - 80
+                if room <= 0:
+                    break
+                content = content[:room]
+            
+            combined += f"Title: {title}\n"
+            combined += f"Content: {content}\n"
+            combined += f"Source: {url}\n"
+            combined += "-" * 50 + "\n"
+            
+        return combined
+    
+    def _context_limit(self, usage: Optional[TokenUsage], stage: str) -> Optional[int]:
+        """Context tokens a stage may send, from the run's budget or the per-call cap"""
+        return usage.context_limit(stage) if usage is not None else Config.MAX_CONTEXT_TOKENS
+    
+    def _determine_person_type(self, analysis: str) -> str:
+        """Determine if person is investor, founder, executive, etc."""
+        analysis_lower = analysis.lower()
+        
+        if any(term in analysis_lower for term in ['investor', 'venture capital', 'vc', 'investment']):
+            return 'investor'
+        elif any(term in analysis_lower for term in ['founder', 'ceo', 'co-founder']):
+            return 'founder'
+        elif any(term in analysis_lower for term in ['executive', 'cto', 'cfo', 'vp']):
+            return 'executive'
+        else:
+            return 'professional'
+    
+    def _determine_company_type(self, analysis: str) -> str:
+        """Determine company type (startup, vc, enterprise, etc.)"""
+        analysis_lower = analysis.lower()
+        
+        if any(term in analysis_lower for term in ['venture capital', 'vc firm', 'investment fund']):
+            return 'vc_firm'
+        elif any(term in analysis_lower for term in ['startup', 'early stage']):
+            return 'startup'
+        else:
+            return 'company'
@@ -1,37 +1,110 @@
+import google.ai.generativelanguage as glm
 import google.generativeai as genai
-from typing import List, Dict
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from google.api_core import exceptions as google_exceptions
+from typing import Callable, List, Dict
 from config import Config
+from tools.analyzer_base import AnalyzerBase
+from tools.model_router import ModelRouter
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.key_pool import get_key_pool
+from utils.token_usage import TokenUsage, estimate_tokens
+from utils.scheduler import propagate
+from utils.transport import Transport
 
-class LLMAnalyzer:
-    def __init__(self):
+# Errors meaning a call ran out of time rather than failed
+TIMEOUT_ERRORS = (DeadlineExceeded, google_exceptions.DeadlineExceeded, TimeoutError)
+
+# Errors meaning the key's quota is used up (HTTP 429)
+RATE_LIMIT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+# Per-entity output markers used when several entities share one request
+_BATCH_OUTPUT_PATTERN = re.compile(r'<<<ENTITY (\d+)>>>\s*(.*?)\s*<<<END ENTITY \1>>>', re.DOTALL)
+
+PERSON_BATCH_INSTRUCTIONS = """
+        You will analyze several different people. Each person's information is in its own
+        ENTITY block below. Treat every entity independently and never mix information between them.
+        
+        For each entity, extract and provide:
+        1. Professional Background (role, experience, education)
+        2. Key Achievements and Notable Work
+        3. Investment Focus Areas (if they're an investor)
+        4. Opinions and Viewpoints (from blogs, tweets, interviews)
+        5. Industry Expertise and Interests
+        6. Recent Activities and News
+        
+        Format each response as a structured analysis focusing on insights that would be valuable for a business meeting.
+        Be concise but comprehensive. If a person is an investor, focus on their investment thesis and portfolio companies.
+        """
+
+COMPANY_BATCH_INSTRUCTIONS = """
+        You will analyze several different companies. Each company's information is in its own
+        ENTITY block below. Treat every entity independently and never mix information between them.
+        
+        For each entity, extract and provide:
+        1. Company Overview (what they do, business model)
+        2. Industry and Market Position
+        3. Key Products/Services
+        4. Funding and Investment History (if available)
+        5. Recent News and Developments
+        6. Company Culture and Values
+        7. If it's a VC firm: Investment Focus Areas and Portfolio Companies
+        
+        Format each response as a structured business analysis. Focus on information relevant for understanding the company's strategy and market position.
+        """
+
+class LLMAnalyzer(AnalyzerBase):
+    SPENDS_TOKENS = True
+    
+    GENERATION_CONFIG = {
+        "temperature": 0.3,
+        "top_p": 0.8,
+        "top_k": 40,
+        "max_output_tokens": 2048,
+    }
+    
+    SAFETY_SETTINGS = [
+        {
+            "category": "HARM_CATEGORY_HARASSMENT",
+            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+        },
+        {
+            "category": "HARM_CATEGORY_HATE_SPEECH",
+            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+        },
+        {
+            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+        },
+        {
+            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+        }
+    ]
+    
+    def __init__(self, fallback: AnalyzerBase = None, transport: Transport = None):
+        # Optional backend used when a Gemini call fails or times out
+        self.fallback = fallback
+        # Live calls by default; recording and replaying transports wrap them
+        self.transport = transport or Transport()
         genai.configure(api_key=Config.GEMINI_API_KEY)
-        # Updated to use current Gemini model names
-        try:
-            # Try the latest models first
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-        except Exception:
-            try:
-                # Fallback to other available models
-                self.model = genai.GenerativeModel('gemini-1.5-pro')
-            except Exception:
-                try:
-                    self.model = genai.GenerativeModel('gemini-pro-latest')
-                except Exception:
-                    # Last resort - try to list available models and use the first one
-                    models = genai.list_models()
-                    available_models = [model.name for model in models if 'generateContent' in model.supported_generation_methods]
-                    if available_models:
-                        model_name = available_models[0].split('/')[-1]  # Extract just the model name
-                        self.model = genai.GenerativeModel(model_name)
-                        print(f"Using model: {model_name}")
-                    else:
-                        raise Exception("No compatible Gemini models found")
+        # Picks the model for each call from recent latency and error rates
+        self.router = ModelRouter()
+        
+        # Requests are spread over the configured Gemini keys by remaining quota
+        self.key_pool = get_key_pool('gemini')
+        # (model name, key) -> GenerativeModel
+        self._models = {}
+        self._models_lock = threading.Lock()
     
-    def analyze_person_data(self, name: str, company: str, search_results: List[Dict]) -> Dict:
+    def analyze_person_data(self, name: str, company: str, search_results: List[Dict],
+                            deadline: Deadline = None, usage: TokenUsage = None) -> Dict:
         """Analyze person data and extract key insights"""
         
-        # Combine all search content
-        content = self._combine_search_results(search_results)
+        # Combine all search content, within the stage's context budget
+        content = self._combine_search_results(search_results, self._context_limit(usage, 'person'))
         
         prompt = f"""
         Analyze the following information about {name} from {company}:
@@ -51,53 +124,30 @@ class LLMAnalyzer:
         """
         
         try:
-            # Add safety settings and generation config
-            generation_config = {
-                "temperature": 0.3,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-            
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH", 
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                }
-            ]
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
+            output = self._generate(prompt, deadline, usage=usage, stage='person')
             
             return {
-                'analysis': response.text,
-                'type': self._determine_person_type(response.text)
+                'analysis': output,
+                'type': self._determine_person_type(output)
             }
+        except TIMEOUT_ERRORS:
+            if self.fallback:
+                return self.fallback.analyze_person_data(name, company, search_results)
+            return self.incomplete_analysis("person")
         except Exception as e:
+            if self.fallback:
+                print(f"Gemini person analysis failed ({e}); using {type(self.fallback).__name__}")
+                return self.fallback.analyze_person_data(name, company, search_results)
             return {
                 'analysis': f"Error analyzing person data: {e}",
                 'type': 'unknown'
             }
     
-    def analyze_company_data(self, company: str, search_results: List[Dict], person_name: str = None) -> Dict:
+    def analyze_company_data(self, company: str, search_results: List[Dict], person_name: str = None,
+                             deadline: Deadline = None, usage: TokenUsage = None) -> Dict:
         """Analyze company data and extract key insights"""
         
-        content = self._combine_search_results(search_results)
+        content = self._combine_search_results(search_results, self._context_limit(usage, 'company'))
         
         prompt = f"""
         Analyze the following information about {company}:
@@ -119,52 +169,30 @@ class LLMAnalyzer:
         """
         
         try:
-            generation_config = {
-                "temperature": 0.3,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-            
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                }
-            ]
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
+            output = self._generate(prompt, deadline, usage=usage, stage='company')
             
             return {
-                'analysis': response.text,
-                'type': self._determine_company_type(response.text)
+                'analysis': output,
+                'type': self._determine_company_type(output)
             }
+        except TIMEOUT_ERRORS:
+            if self.fallback:
+                return self.fallback.analyze_company_data(company, search_results, person_name)
+            return self.incomplete_analysis("company")
         except Exception as e:
+            if self.fallback:
+                print(f"Gemini company analysis failed ({e}); using {type(self.fallback).__name__}")
+                return self.fallback.analyze_company_data(company, search_results, person_name)
             return {
                 'analysis': f"Error analyzing company data: {e}",
                 'type': 'unknown'
             }
     
-    def extract_opinions_and_insights(self, name: str, social_results: List[Dict]) -> Dict:
+    def extract_opinions_and_insights(self, name: str, social_results: List[Dict],
+                                      deadline: Deadline = None, usage: TokenUsage = None) -> Dict:
         """Extract opinions and insights from social media and blog content"""
         
-        content = self._combine_search_results(social_results)
+        content = self._combine_search_results(social_results, self._context_limit(usage, 'social'))
         
         if not content.strip():
             return {'insights': 'No social media or blog content found.'}
@@ -186,80 +214,256 @@ class LLMAnalyzer:
         """
         
         try:
-            generation_config = {
-                "temperature": 0.3,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-            
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                }
-            ]
+            output = self._generate(prompt, deadline, usage=usage, stage='social')
             
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            
-            return {'insights': response.text}
+            return {'insights': output}
+        except TIMEOUT_ERRORS:
+            if self.fallback:
+                return self.fallback.extract_opinions_and_insights(name, social_results)
+            return self.incomplete_insights()
         except Exception as e:
+            if self.fallback:
+                print(f"Gemini social analysis failed ({e}); using {type(self.fallback).__name__}")
+                return self.fallback.extract_opinions_and_insights(name, social_results)
             return {'insights': f"Error analyzing social content: {e}"}
     
-    def _combine_search_results(self, results: List[Dict]) -> str:
-        """Combine search results into a single text block"""
-        combined = ""
-        for result in results:
-            title = result.get('title', '')
-            content = result.get('content', '')
-            url = result.get('url', '')
+    def analyze_person_data_batch(self, entities: List[Dict], deadline: Deadline = None,
+                                  usage: TokenUsage = None) -> List[Dict]:
+        """Analyze several people, packing as many as fit into each Gemini request
+        
+        Each entity is a dict with 'name', 'company', 'search_results' and optionally
+        'usage', its own TokenUsage. Results come back in the same order, in the format
+        analyze_person_data returns. usage tallies the whole batch.
+        """
+        return self._analyze_batch(
+            entities,
+            'person',
+            PERSON_BATCH_INSTRUCTIONS,
+            lambda entity: f"{entity['name']} from {entity['company']}",
+            lambda text: {'analysis': text, 'type': self._determine_person_type(text)},
+            lambda entity: self.analyze_person_data(
+                entity['name'], entity['company'], entity['search_results'], deadline, entity.get('usage')
+            ),
+            deadline,
+            usage
+        )
+    
+    def analyze_company_data_batch(self, entities: List[Dict], deadline: Deadline = None,
+                                   usage: TokenUsage = None) -> List[Dict]:
+        """Analyze several companies, packing as many as fit into each Gemini request
+        
+        Each entity is a dict with 'company', 'search_results' and optionally 'person_name'
+        and 'usage'.
+        """
+        return self._analyze_batch(
+            entities,
+            'company',
+            COMPANY_BATCH_INSTRUCTIONS,
+            lambda entity: (
+                f"{entity['company']} (note: {entity['person_name']} is associated with this company)"
+                if entity.get('person_name') else entity['company']
+            ),
+            lambda text: {'analysis': text, 'type': self._determine_company_type(text)},
+            lambda entity: self.analyze_company_data(
+                entity['company'], entity['search_results'], entity.get('person_name'), deadline,
+                entity.get('usage')
+            ),
+            deadline,
+            usage
+        )
+    
+    def _analyze_batch(self, entities: List[Dict], stage: str, instructions: str, describe: Callable[[Dict], str],
+                       parse: Callable[[str], Dict], analyze_single: Callable[[Dict], Dict],
+                       deadline: Deadline = None, usage: TokenUsage = None) -> List[Dict]:
+        """Pack entities into shared requests, split the output, and retry failures one by one
+        
+        Entities whose request has not finished by the deadline come back as None.
+        """
+        blocks = [
+            f"=== ENTITY {{number}}: {describe(entity)} ===\n"
+            f"{self._combine_search_results(entity['search_results'], self._context_limit(entity.get('usage'), stage))}\n"
+            f"=== END OF ENTITY {{number}} DATA ===\n"
+            for entity in entities
+        ]
+        batches = self._pack_batches(instructions, blocks)
+        
+        def analyze_packed(batch: List[int]) -> Dict[int, Dict]:
+            if len(batch) == 1:
+                return {batch[0]: analyze_single(entities[batch[0]])}
             
-            combined += f"Title: {title}\n"
-            combined += f"Content: {content}\n"
-            combined += f"Source: {url}\n"
-            combined += "-" * 50 + "\n"
+            prompt = instructions + f"""
+        Write the analysis for each entity between the markers <<<ENTITY k>>> and <<<END ENTITY k>>>,
+        each marker on its own line, where k is the entity number. Cover all {len(batch)} entities in order
+        and write nothing outside the markers.
+        
+""" + ''.join(blocks[index].format(number=position) for position, index in enumerate(batch, 1))
             
-        return combined
+            call_usage = TokenUsage()
+            try:
+                output = self._generate(
+                    prompt, deadline,
+                    max_output_tokens=min(self.GENERATION_CONFIG['max_output_tokens'] * len(batch),
+                                          Config.BATCH_MAX_OUTPUT_TOKENS),
+                    usage=call_usage,
+                    stage=f"{stage}_batch"
+                )
+                outputs = {int(number): text for number, text in _BATCH_OUTPUT_PATTERN.findall(output)}
+            except Exception as e:
+                print(f"Batched analysis of {len(batch)} entities failed ({e}); retrying individually")
+                outputs = {}
+            self._share_batch_usage(call_usage, [entities[index] for index in batch], [blocks[index] for index in batch])
+            if usage is not None:
+                usage.add(call_usage)
+            
+            packed_results = {}
+            for position, index in enumerate(batch, 1):
+                text = outputs.get(position, '').strip()
+                if len(text) >= Config.BATCH_MIN_OUTPUT_CHARS:
+                    packed_results[index] = parse(text)
+                else:
+                    # Missing or unparseable output for this entity: ask for it on its own
+                    packed_results[index] = analyze_single(entities[index])
+            return packed_results
+        
+        # Packed requests go out together; the Gemini scheduler decides how many run at once
+        results: List[Dict] = [None] * len(entities)
+        executor = ThreadPoolExecutor(max_workers=max(min(len(batches), Config.SCHEDULER_SLOTS['gemini']), 1))
+        futures = [executor.submit(propagate(analyze_packed), batch) for batch in batches]
+        try:
+            wait(futures, timeout=Deadline.coerce(deadline).remaining())
+            for future in futures:
+                # A request still running at the deadline leaves only its own entities without analysis
+                if future.done() and future.exception() is None:
+                    for index, result in future.result().items():
+                        results[index] = result
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        
+        return results
+    
+    def _share_batch_usage(self, call_usage: TokenUsage, entities: List[Dict], blocks: List[str]) -> None:
+        """Split a shared request's tokens between its entities in proportion to their context size"""
+        sizes = [estimate_tokens(block) for block in blocks]
+        for stage, tally in call_usage.stages.items():
+            for entity, size in zip(entities, sizes):
+                if entity.get('usage') is not None:
+                    entity['usage'].record(
+                        stage,
+                        tally['input_tokens'] * size // sum(sizes),
+                        tally['output_tokens'] * size // sum(sizes),
+                        estimated=True
+                    )
+    
+    def _pack_batches(self, instructions: str, blocks: List[str]) -> List[List[int]]:
+        """Greedily group entity blocks into requests under the prompt token limit"""
+        budget = Config.BATCH_PROMPT_TOKEN_LIMIT - estimate_tokens(instructions)
+        batches, current, used = [], [], 0
+        
+        for index, block in enumerate(blocks):
+            tokens = estimate_tokens(block)
+            if current and (used + tokens > budget or len(current) >= Config.BATCH_MAX_ENTITIES):
+                batches.append(current)
+                current, used = [], 0
+            current.append(index)
+            used += tokens
+        
+        if current:
+            batches.append(current)
+        return batches
     
-    def _determine_person_type(self, analysis: str) -> str:
-        """Determine if person is investor, founder, executive, etc."""
-        analysis_lower = analysis.lower()
-        
-        if any(term in analysis_lower for term in ['investor', 'venture capital', 'vc', 'investment']):
-            return 'investor'
-        elif any(term in analysis_lower for term in ['founder', 'ceo', 'co-founder']):
-            return 'founder'
-        elif any(term in analysis_lower for term in ['executive', 'cto', 'cfo', 'vp']):
-            return 'executive'
-        else:
-            return 'professional'
+    def _generate(self, prompt: str, deadline: Deadline = None, max_output_tokens: int = None,
+                  usage: TokenUsage = None, stage: str = 'analysis') -> str:
+        """Send a prompt to Gemini with the shared settings and the remaining time budget, returning the text
+        
+        The call's input and output tokens are recorded in usage under stage.
+        """
+        generation_config = self.GENERATION_CONFIG
+        if max_output_tokens:
+            generation_config = dict(generation_config, max_output_tokens=max_output_tokens)
+        
+        def record_usage(body: Dict) -> None:
+            if usage is None:
+                return
+            counts = body.get('usage')
+            if counts:
+                usage.record(stage, counts['input_tokens'], counts['output_tokens'])
+            else:
+                usage.record(stage, estimate_tokens(prompt), estimate_tokens(body['text']), estimated=True)
+        
+        # The router holds a Gemini slot for each model attempt, hedged ones included;
+        # a hedged call that loses the race is still billed, so its tokens count too
+        body = self.transport.call(
+            'gemini',
+            {'prompt': prompt, 'generation_config': generation_config},
+            lambda: self.router.call(
+                lambda model_name: self._send(model_name, prompt, generation_config, deadline),
+                estimate_tokens(prompt), deadline, discarded=record_usage
+            ),
+            deadline
+        )
+        if isinstance(body, str):
+            # Recorded before token counts were kept
+            body = {'text': body}
+        record_usage(body)
+        
+        return body['text']
+    
+    def _send(self, model_name: str, prompt: str, generation_config: Dict, deadline: Deadline = None) -> Dict:
+        """The live Gemini call behind _generate, on the routed model: the text plus the provider's token counts
+        
+        A key that hits its quota is cooled down and the call moves to another key.
+        """
+        tried = []
+        while True:
+            key = self.key_pool.acquire(deadline, exclude=tried)
+            tried.append(key)
+            try:
+                response = self._model(model_name, key).generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    safety_settings=self.SAFETY_SETTINGS,
+                    request_options={'timeout': Deadline.coerce(deadline).timeout(Config.LLM_TIMEOUT)}
+                )
+            except RATE_LIMIT_ERRORS:
+                self.key_pool.rate_limited(key)
+                if len(tried) >= len(self.key_pool):
+                    raise
+                continue
+            except Exception:
+                self.key_pool.failed(key)
+                raise
+            self.key_pool.succeeded(key)
+            break
+        
+        body = {'text': response.text}
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is not None and getattr(metadata, 'prompt_token_count', None):
+            body['usage'] = {
+                'input_tokens': metadata.prompt_token_count,
+                'output_tokens': getattr(metadata, 'candidates_token_count', 0) or 0
+            }
+        return body
     
-    def _determine_company_type(self, analysis: str) -> str:
-        """Determine company type (startup, vc, enterprise, etc.)"""
-        analysis_lower = analysis.lower()
-        
-        if any(term in analysis_lower for term in ['venture capital', 'vc firm', 'investment fund']):
-            return 'vc_firm'
-        elif any(term in analysis_lower for term in ['startup', 'early stage']):
-            return 'startup'
-        else:
-            return 'company'
+    def _model(self, model_name: str, key: str) -> genai.GenerativeModel:
+        """A model whose client is authenticated by key (the configured default key uses the global client)"""
+        with self._models_lock:
+            model = self._models.get((model_name, key))
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                if key != Config.GEMINI_API_KEY:
+                    # genai.configure() is process-wide and GenerativeModel takes no client or key, so
+                    # other keys get a client of their own through the attribute GenerativeModel reads
+                    # its client from (google-generativeai 0.7.2, pinned in requirements.txt)
+                    if getattr(model, '_client', False) is not None:
+                        raise RuntimeError(
+                            "This google-generativeai version does not read its client from "
+                            "GenerativeModel._client; per-key Gemini clients need 0.7.2 (see requirements.txt)"
+                        )
+                    model._client = glm.GenerativeServiceClient(client_options={'api_key': key})
+                self._models[(model_name, key)] = model
+            return model
     
     def list_available_models(self):
         """Helper method to list available Gemini models"""
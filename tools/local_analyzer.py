@@ -0,0 +1,219 @@
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+from config import Config
+from tools.analyzer_base import AnalyzerBase
+from utils.deadline import Deadline
+from utils.token_usage import TokenUsage
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most my
+no nor not now of off on once only or other our out over own same she should so some such than
+that the their them then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your
+""".split())
+
+# Section headings mirror the Gemini prompts; the keywords steer sentence selection
+PERSON_SECTIONS = [
+    ("Professional Background", "role position title experience education degree university career joined previously worked"),
+    ("Key Achievements and Notable Work", "achievement award founded built launched led grew notable recognized created"),
+    ("Investment Focus Areas", "invest investor investment portfolio fund venture capital seed series thesis"),
+    ("Opinions and Viewpoints", "believe think opinion view argue says said wrote interview"),
+    ("Industry Expertise and Interests", "industry expertise expert focus interest market sector technology"),
+    ("Recent Activities and News", "recent recently announced new news latest today week month"),
+]
+
+COMPANY_SECTIONS = [
+    ("Company Overview", "company provides platform builds offers mission business model customers"),
+    ("Industry and Market Position", "market industry leader competitor share position sector growth"),
+    ("Key Products/Services", "product products service services platform software solution launch"),
+    ("Funding and Investment History", "funding raised round series seed investors valuation million billion"),
+    ("Recent News and Developments", "recent recently announced new news latest partnership acquisition"),
+    ("Company Culture and Values", "culture values team employees mission hiring remote people"),
+    ("Investment Focus Areas and Portfolio Companies", "portfolio invests venture capital fund thesis stage"),
+]
+
+INSIGHT_SECTIONS = [
+    ("Key Opinions and Viewpoints", "believe think opinion view argue important should must"),
+    ("Industry Perspectives and Predictions", "future predict will trend expect next years industry market"),
+    ("Investment Philosophy", "invest investor founders startups thesis portfolio back"),
+    ("Recent Thoughts and Commentary", "recent recently wrote posted tweet thread today week"),
+    ("Areas of Expertise and Interest", "expertise interest focus passionate working building research"),
+]
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+class LocalAnalyzer(AnalyzerBase):
+    """Extractive TF-IDF / TextRank summaries built on CPU from the search results, no LLM"""
+
+    def __init__(self, sentences_per_section: int = None):
+        self.sentences_per_section = sentences_per_section or Config.LOCAL_SENTENCES_PER_SECTION
+
+    def analyze_person_data(self, name: str, company: str, search_results: List[Dict],
+                            deadline: Deadline = None, usage: TokenUsage = None) -> Dict:
+        """Summarize person data into the same sections the Gemini analysis uses"""
+        analysis = self.summarize(search_results, PERSON_SECTIONS, [name, company])
+        return {
+            'analysis': analysis,
+            'type': self._determine_person_type(analysis)
+        }
+
+    def analyze_company_data(self, company: str, search_results: List[Dict], person_name: str = None,
+                             deadline: Deadline = None, usage: TokenUsage = None) -> Dict:
+        """Summarize company data into the same sections the Gemini analysis uses"""
+        analysis = self.summarize(search_results, COMPANY_SECTIONS, [company, person_name])
+        return {
+            'analysis': analysis,
+            'type': self._determine_company_type(analysis)
+        }
+
+    def extract_opinions_and_insights(self, name: str, social_results: List[Dict],
+                                      deadline: Deadline = None, usage: TokenUsage = None) -> Dict:
+        """Summarize social and blog content into opinion sections"""
+        if not self._combine_search_results(social_results).strip():
+            return {'insights': 'No social media or blog content found.'}
+
+        return {'insights': self.summarize(social_results, INSIGHT_SECTIONS, [name])}
+
+    def summarize(self, search_results: List[Dict], sections: List[Tuple[str, str]],
+                  focus_terms: List[str]) -> str:
+        """Build a numbered, sectioned extractive summary of the search results"""
+        sentences, sources = self._split_sentences(search_results)
+        if not sentences:
+            return "No usable content found in the search results."
+
+        matrix, vocabulary, idf = self._tfidf(sentences)
+        centrality = self._textrank(matrix)
+
+        # Sentences that mention the entity are preferred in every section
+        focus = self._query_vector(' '.join(term for term in focus_terms if term), vocabulary, idf)
+        boost = 1.0 + (matrix @ focus > 0)
+
+        used = np.zeros(len(sentences), dtype=bool)
+        lines = [f"Extractive summary of {len(search_results)} sources (generated locally, no LLM)."]
+
+        for number, (heading, keywords) in enumerate(sections, 1):
+            relevance = matrix @ self._query_vector(keywords, vocabulary, idf)
+            scores = centrality * (0.2 + relevance) * boost
+            scores[(relevance <= 0) | used] = -1.0
+
+            lines.append("")
+            lines.append(f"{number}. {heading}")
+            chosen = []
+            for index in np.argsort(-scores):
+                if scores[index] < 0 or len(chosen) >= self.sentences_per_section:
+                    break
+                # Skip near-duplicates of sentences already picked for this section
+                if chosen and float(np.max(matrix[chosen] @ matrix[index])) > 0.8:
+                    continue
+                chosen.append(index)
+                used[index] = True
+
+            if not chosen:
+                lines.append("- No information found in the sources.")
+            for index in sorted(chosen):
+                source = f" ({sources[index]})" if sources[index] else ""
+                lines.append(f"- {sentences[index]}{source}")
+
+        return '\n'.join(lines)
+
+    def _split_sentences(self, search_results: List[Dict]) -> Tuple[List[str], List[str]]:
+        """Split result content into candidate sentences, taking them round-robin across results"""
+        per_result = []
+        for result in search_results:
+            text = f"{result.get('title', '')}. {result.get('content', '')}"
+            candidates = [
+                ' '.join(sentence.split())
+                for sentence in _SENTENCE_SPLIT.split(text)
+            ]
+            per_result.append((
+                [sentence for sentence in candidates if 40 <= len(sentence) <= 400],
+                result.get('url', '')
+            ))
+
+        sentences, sources, seen = [], [], set()
+        depth = 0
+        while len(sentences) < Config.LOCAL_MAX_SENTENCES:
+            added = False
+            for candidates, url in per_result:
+                if depth < len(candidates):
+                    added = True
+                    sentence = candidates[depth]
+                    key = sentence.lower()
+                    if key not in seen:
+                        seen.add(key)
+                        sentences.append(sentence)
+                        sources.append(url)
+            if not added:
+                break
+            depth += 1
+
+        return sentences[:Config.LOCAL_MAX_SENTENCES], sources[:Config.LOCAL_MAX_SENTENCES]
+
+    def _tokens(self, text: str) -> List[str]:
+        return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+    def _tfidf(self, sentences: List[str]) -> Tuple[np.ndarray, Dict[str, int], np.ndarray]:
+        """L2-normalized TF-IDF matrix (sentences x terms) over a capped vocabulary"""
+        tokenized = [self._tokens(sentence) for sentence in sentences]
+
+        document_frequency = Counter()
+        for tokens in tokenized:
+            document_frequency.update(set(tokens))
+        vocabulary = {
+            term: column
+            for column, (term, _) in enumerate(document_frequency.most_common(Config.LOCAL_MAX_VOCABULARY))
+        }
+
+        rows, columns = [], []
+        for row, tokens in enumerate(tokenized):
+            for token in tokens:
+                column = vocabulary.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+
+        counts = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1.0)
+
+        df = (counts > 0).sum(axis=0)
+        idf = (np.log((1.0 + len(sentences)) / (1.0 + df)) + 1.0).astype(np.float32)
+        matrix = np.log1p(counts) * idf
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return matrix, vocabulary, idf
+
+    def _query_vector(self, text: str, vocabulary: Dict[str, int], idf: np.ndarray) -> np.ndarray:
+        """Project free text into the TF-IDF space"""
+        vector = np.zeros(idf.shape[0], dtype=np.float32)
+        for token in self._tokens(text):
+            column = vocabulary.get(token)
+            if column is None and len(token) > 4:
+                # Loose match on plurals/inflections ("investor" vs "investors")
+                column = vocabulary.get(token + 's', vocabulary.get(token.rstrip('s')))
+            if column is not None:
+                vector[column] = idf[column]
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _textrank(self, matrix: np.ndarray, damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+        """TextRank centrality from the cosine similarity graph, scaled to [0, 1]"""
+        count = matrix.shape[0]
+        similarity = matrix @ matrix.T
+        np.fill_diagonal(similarity, 0.0)
+
+        row_sums = similarity.sum(axis=1, keepdims=True)
+        transition = np.where(row_sums > 0, similarity / np.where(row_sums > 0, row_sums, 1.0), 1.0 / count)
+
+        rank = np.full(count, 1.0 / count, dtype=np.float32)
+        for _ in range(iterations):
+            rank = (1.0 - damping) / count + damping * (transition.T @ rank)
+
+        return rank / rank.max() if rank.max() > 0 else rank
@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.scheduler import Scheduler, current_priority, get_scheduler, propagate
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class ModelRouter:
+    """Chooses the Gemini model for each call from recent latency and error rates
+
+    Models are tried in Config.GEMINI_MODELS order, or Config.GEMINI_LARGE_PROMPT_MODELS
+    order for prompts of ROUTER_LARGE_PROMPT_TOKENS or more. A model is skipped while
+    more than ROUTER_MAX_ERROR_RATE of its latest calls failed, and passed over for a
+    faster one while its p95 latency for prompts of the call's size does not fit the
+    latency target (the priority class's target, or what is left of the run's
+    deadline). A failed call is retried once on the next model.
+
+    Every attempt holds a Gemini scheduler slot while it runs. With hedging on, a
+    call still running at its model's p95 latency is sent to the next model as well;
+    the first answer wins, and the slower call is left to finish in the background
+    in its own slot, still feeding the latency statistics and handing its result
+    to the caller's discarded callback.
+    """
+
+    def __init__(self, models: List[str] = None, hedge: bool = None, large_prompt_models: List[str] = None,
+                 scheduler: Scheduler = None):
+        self.models = list(models or Config.GEMINI_MODELS)
+        self.large_prompt_models = list(large_prompt_models or Config.GEMINI_LARGE_PROMPT_MODELS or self.models)
+        self.hedge = Config.HEDGE_REQUESTS if hedge is None else hedge
+        self.scheduler = scheduler or get_scheduler('gemini')
+        # model -> deque of (finished at, seconds, large prompt, succeeded)
+        self._samples = {model: deque() for model in dict.fromkeys(self.models + self.large_prompt_models)}
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def call(self, send: Callable[[str], Any], prompt_tokens: int, deadline: Deadline = None,
+             discarded: Callable[[Any], None] = None) -> Any:
+        """Run send(model_name) on the best model for this call, returning its result
+
+        discarded receives the result of a hedged call that lost the race, once it arrives.
+        """
+        deadline = Deadline.coerce(deadline)
+        ranked = self.rank(prompt_tokens, deadline)
+        large = prompt_tokens >= Config.ROUTER_LARGE_PROMPT_TOKENS
+
+        if self.hedge:
+            delay = self._hedge_delay(ranked[0], large)
+            if delay is not None:
+                return self._hedged_call(send, ranked, large, delay, deadline, discarded)
+
+        last_error = None
+        # One failover: an error that is not the model's fault (a blocked prompt, say) should not fan out
+        for model in ranked[:2]:
+            if deadline.expired():
+                break
+            try:
+                return self._attempt(model, send, large, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                last_error = e
+        if last_error is None:
+            raise DeadlineExceeded("Deadline reached before any model was called")
+        raise last_error
+
+    def rank(self, prompt_tokens: int, deadline: Deadline = None) -> List[str]:
+        """Models in the order to try them for a prompt of this size"""
+        target = Config.ROUTER_LATENCY_TARGETS.get(current_priority())
+        remaining = Deadline.coerce(deadline).remaining()
+        if remaining is not None:
+            target = min(target, remaining) if target else remaining
+        large = prompt_tokens >= Config.ROUTER_LARGE_PROMPT_TOKENS
+
+        with self._lock:
+            self._forget_old()
+            healthy, degraded = [], []
+            for model in (self.large_prompt_models if large else self.models):
+                (healthy if self._error_rate(model) <= Config.ROUTER_MAX_ERROR_RATE else degraded).append(model)
+            expected = {model: self._p95(model, large) for model in healthy}
+            error_rates = {model: self._error_rate(model) for model in degraded}
+
+        # Models without enough samples are given the benefit of the doubt
+        fits = [model for model in healthy
+                if target is None or expected[model] is None or expected[model] <= target]
+        slow = sorted((model for model in healthy if model not in fits), key=lambda model: expected[model])
+        return fits + slow + sorted(degraded, key=lambda model: error_rates[model])
+
+    def _attempt(self, model: str, send: Callable[[str], Any], large: bool, deadline: Deadline,
+                 settled: threading.Event = None) -> Any:
+        # Wait for a Gemini slot in the caller's priority class before the call and its timer start
+        with self.scheduler.slot(deadline):
+            if settled is not None and settled.is_set():
+                # The other half of a hedged call answered while this one was queued
+                raise CancelledError()
+            started = time.monotonic()
+            try:
+                result = send(model)
+            except DeadlineExceeded:
+                # Out of budget before the call went out: says nothing about the model
+                raise
+            except Exception:
+                self._record(model, time.monotonic() - started, large, False)
+                raise
+            self._record(model, time.monotonic() - started, large, True)
+            return result
+
+    def _hedged_call(self, send: Callable[[str], Any], ranked: List[str], large: bool, delay: float,
+                     deadline: Deadline, discarded: Callable[[Any], None] = None) -> Any:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2 * self.scheduler.slots)
+            executor = self._executor
+
+        settled = threading.Event()
+        first = executor.submit(propagate(self._attempt), ranked[0], send, large, deadline, settled)
+        remaining = deadline.remaining()
+        done, _ = wait([first], timeout=delay if remaining is None else min(delay, remaining))
+        if done and first.exception() is None:
+            return first.result()
+
+        # Slow or failed: ask the next model (or the same one again, if it is the only one)
+        backup = ranked[1] if len(ranked) > 1 else ranked[0]
+        second = executor.submit(propagate(self._attempt), backup, send, large, deadline, settled)
+        if not done:
+            with self._lock:
+                self._hedged += 1
+
+        pending = {second} if done else {first, second}
+        last_error = first.exception() if done else None
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+                if not finished:
+                    raise DeadlineExceeded("Deadline reached while waiting for hedged Gemini calls")
+                for future in finished:
+                    if future.exception() is None:
+                        if future is second and not done:
+                            with self._lock:
+                                self._hedge_wins += 1
+                        loser = first if future is second else second
+                        if discarded is not None:
+                            loser.add_done_callback(lambda loser: self._hand_over(loser, discarded))
+                        return future.result()
+                    last_error = future.exception()
+            raise last_error
+        finally:
+            # A call still queued for a slot is not sent at all
+            settled.set()
+
+    def _hand_over(self, future, discarded: Callable[[Any], None]) -> None:
+        """Pass a losing hedged call's result on, so its token usage is still counted"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            discarded(future.result())
+        except Exception as e:
+            print(f"Error recording a discarded Gemini call: {e}")
+
+    def _hedge_delay(self, model: str, large: bool) -> Optional[float]:
+        """How long to wait for the model before hedging: its p95 latency, once it is known"""
+        with self._lock:
+            self._forget_old()
+            return self._p95(model, large)
+
+    def _record(self, model: str, seconds: float, large: bool, succeeded: bool) -> None:
+        with self._lock:
+            self._samples[model].append((time.monotonic(), seconds, large, succeeded))
+
+    def _forget_old(self) -> None:
+        cutoff = time.monotonic() - Config.ROUTER_WINDOW_SECONDS
+        for samples in self._samples.values():
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+
+    def _error_rate(self, model: str) -> float:
+        """Share of the model's latest ROUTER_ERROR_SAMPLES calls that failed"""
+        samples = list(self._samples[model])[-Config.ROUTER_ERROR_SAMPLES:]
+        if len(samples) < Config.ROUTER_MIN_SAMPLES:
+            return 0.0
+        return sum(1 for sample in samples if not sample[3]) / len(samples)
+
+    def _p95(self, model: str, large: bool) -> Optional[float]:
+        """p95 latency of successful calls with prompts of this size (or of any size, if too few)"""
+        successes = [sample for sample in self._samples[model] if sample[3]]
+        sized = [sample[1] for sample in successes if sample[2] == large]
+        if len(sized) >= Config.ROUTER_MIN_SAMPLES:
+            return _percentile(sized, 0.95)
+        if len(successes) >= Config.ROUTER_MIN_SAMPLES:
+            return _percentile([sample[1] for sample in successes], 0.95)
+        return None
+
+    def stats(self) -> Dict:
+        """Calls, error rate and latency percentiles per model over the window, plus hedging counts"""
+        with self._lock:
+            self._forget_old()
+            models = {}
+            for model, samples in self._samples.items():
+                latencies = [sample[1] for sample in samples if sample[3]]
+                models[model] = {
+                    'calls': len(samples),
+                    'errors': sum(1 for sample in samples if not sample[3]),
+                    'p50': _percentile(latencies, 0.5) if latencies else None,
+                    'p95': _percentile(latencies, 0.95) if latencies else None
+                }
+            return {'models': models, 'hedged': self._hedged, 'hedge_wins': self._hedge_wins}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,224 @@
+from typing import Dict, List
+import re
+from config import Config
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: case, quoting, punctuation, word order and plurals ignored"""
+    tokens = []
+    for token in re.findall(r'\w+', query.lower()):
+        if len(token) > 4 and token.endswith('ies'):
+            token = token[:-3] + 'y'
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return ' '.join(sorted(set(tokens)))
+
+
+class PlannedQuery:
+    """A single search query together with the group it feeds and its result budget"""
+
+    def __init__(self, query: str, group: str, max_results: int, priority: int = 0):
+        self.query = query
+        self.group = group
+        self.max_results = max_results
+        self.priority = priority
+
+    def __repr__(self):
+        return f"PlannedQuery({self.query!r}, group={self.group!r}, max_results={self.max_results})"
+
+
+class UniqueQuery:
+    """One query to execute, feeding every group that asked for an equivalent query"""
+
+    def __init__(self, planned: PlannedQuery):
+        self.query = planned.query
+        self.max_results = planned.max_results
+        self.priority = planned.priority
+        self.groups = [planned.group]
+
+    def merge(self, planned: PlannedQuery) -> None:
+        self.max_results = max(self.max_results, planned.max_results)
+        self.priority = min(self.priority, planned.priority)
+        if planned.group not in self.groups:
+            self.groups.append(planned.group)
+
+
+class QueryPlan:
+    """An ordered set of search queries, grouped by the analysis that consumes them"""
+
+    def __init__(self):
+        self.queries: List[PlannedQuery] = []
+        # Groups with a target stop issuing queries once they have enough relevant sources
+        self.targets: Dict[str, int] = {}
+        self.relevance_terms: Dict[str, List[str]] = {}
+        # Results per group that get full content in two-phase search
+        self.content_limits: Dict[str, int] = {}
+        # Number of queries actually sent, filled in when the plan is executed
+        self.executed = 0
+        # Groups that lost queries to the run's deadline
+        self.incomplete_groups = set()
+
+    def add(self, query: str, group: str, max_results: int, priority: int = 0) -> 'QueryPlan':
+        """Add a query; lower priority values run first"""
+        self.queries.append(PlannedQuery(query, group, max_results, priority))
+        return self
+
+    def set_target(self, group: str, max_sources: int, relevance_terms: List[str] = None) -> 'QueryPlan':
+        """Stop searching for a group once it has max_sources unique relevant results"""
+        self.targets[group] = max_sources
+        return self.set_relevance_terms(group, relevance_terms)
+
+    def set_relevance_terms(self, group: str, relevance_terms: List[str]) -> 'QueryPlan':
+        """Names a group's results should mention; others rank below them"""
+        self.relevance_terms[group] = [term.lower() for term in (relevance_terms or []) if term]
+        return self
+
+    def set_content_limit(self, group: str, limit: int) -> 'QueryPlan':
+        """Number of top results whose full content is fetched for a group"""
+        self.content_limits[group] = limit
+        return self
+
+    def content_limit(self, group: str) -> int:
+        return self.content_limits.get(group, self.targets.get(group, Config.MAX_CONTENT_FETCHES))
+
+    def groups(self) -> List[str]:
+        """Group names in the order they were first added"""
+        seen = []
+        for planned in self.queries:
+            if planned.group not in seen:
+                seen.append(planned.group)
+        return seen
+
+    def group_queries(self) -> Dict[str, List[str]]:
+        """Planned query strings per group"""
+        queries = {group: [] for group in self.groups()}
+        for planned in self.ordered():
+            queries[planned.group].append(planned.query)
+        return queries
+
+    def ordered(self) -> List[PlannedQuery]:
+        """Queries in execution order (stable for equal priorities)"""
+        return sorted(self.queries, key=lambda planned: planned.priority)
+
+    def unique(self) -> List[UniqueQuery]:
+        """Equivalent queries merged into one, in execution order"""
+        merged: Dict[str, UniqueQuery] = {}
+        for planned in self.ordered():
+            key = normalize_query(planned.query)
+            if key in merged:
+                merged[key].merge(planned)
+            else:
+                merged[key] = UniqueQuery(planned)
+        return sorted(merged.values(), key=lambda unique: unique.priority)
+
+    def stats(self) -> Dict[str, int]:
+        """Planned versus executed query counts"""
+        unique_count = len(self.unique())
+        return {
+            'planned': len(self.queries),
+            'unique': unique_count,
+            'executed': self.executed,
+            'saved': len(self.queries) - self.executed
+        }
+
+    def is_relevant(self, group: str, result: Dict) -> bool:
+        """Check whether a result mentions the entity a group is about"""
+        terms = self.relevance_terms.get(group)
+        if not terms:
+            return True
+
+        text = f"{result.get('title', '')} {result.get('content', '')}".lower()
+        return any(term in text for term in terms)
+
+
+class QueryPlanner:
+    """Collects every query a research mode needs into a single plan"""
+
+    def plan(self, mode: str, person_name: str, company_name: str) -> QueryPlan:
+        """Build the query plan for a research mode"""
+        if mode == 'quick':
+            return self.quick_plan(person_name, company_name)
+        if mode == 'investor':
+            return self.investor_plan(person_name, company_name)
+        return self.full_plan(person_name, company_name)
+
+    def full_plan(self, person_name: str, company_name: str) -> QueryPlan:
+        """Person, company and social queries for comprehensive research"""
+        plan = QueryPlan()
+        self._add_queries(plan, 'person', person_queries(person_name, company_name), 5)
+        self._add_queries(plan, 'company', company_queries(company_name), 5)
+        self._add_queries(plan, 'social', social_queries(person_name), 3)
+
+        plan.set_relevance_terms('person', [person_name])
+        plan.set_relevance_terms('company', [company_name])
+        plan.set_relevance_terms('social', [person_name])
+        return plan
+
+    def quick_plan(self, person_name: str, company_name: str) -> QueryPlan:
+        """Budgeted person and company queries that stop once enough sources are found"""
+        plan = QueryPlan()
+        self._add_queries(plan, 'person', person_queries(person_name, company_name), Config.QUICK_RESULTS_PER_QUERY)
+        self._add_queries(plan, 'company', company_queries(company_name), Config.QUICK_RESULTS_PER_QUERY)
+
+        plan.set_target('person', Config.QUICK_MAX_SOURCES, [person_name])
+        plan.set_target('company', Config.QUICK_MAX_SOURCES, [company_name])
+        return plan
+
+    def investor_plan(self, person_name: str, vc_firm: str) -> QueryPlan:
+        """Investor-specific queries plus social content for investment opinions"""
+        plan = QueryPlan()
+        self._add_queries(plan, 'investor', investor_queries(person_name, vc_firm), 5)
+        self._add_queries(plan, 'social', social_queries(person_name), 3)
+        plan.set_relevance_terms('investor', [person_name, vc_firm])
+        plan.set_relevance_terms('social', [person_name])
+        # Investor analysis draws on both the person and the firm, so it reads more pages
+        plan.set_content_limit('investor', 2 * Config.MAX_CONTENT_FETCHES)
+        return plan
+
+    def _add_queries(self, plan: QueryPlan, group: str, queries: List[str], max_results: int) -> None:
+        # Interleave groups so each one gets its most valuable query early
+        for priority, query in enumerate(queries):
+            plan.add(query, group, max_results, priority)
+
+
+def person_queries(name: str, company: str = None) -> List[str]:
+    """Person queries, highest-value first"""
+    queries = []
+    if company:
+        # Name plus company is the most specific query and disambiguates namesakes
+        queries.append(f'"{name}" "{company}"')
+    queries.extend([
+        f'"{name}" bio profile',
+        f'"{name}" background experience',
+    ])
+    return queries
+
+
+def company_queries(company: str) -> List[str]:
+    """Company queries, highest-value first"""
+    return [
+        f'"{company}" company about',
+        f'"{company}" business model',
+        f'"{company}" funding investment'
+    ]
+
+
+def social_queries(name: str) -> List[str]:
+    """Social media and blog queries, highest-value first"""
+    return [
+        f'"{name}" twitter tweet',
+        f'"{name}" blog post article',
+        f'"{name}" linkedin post',
+        f'"{name}" medium article'
+    ]
+
+
+def investor_queries(name: str, vc_firm: str) -> List[str]:
+    """Investor-focused queries, highest-value first"""
+    return [
+        f'"{name}" "{vc_firm}" portfolio investments',
+        f'"{name}" investment thesis',
+        f'"{vc_firm}" portfolio companies',
+        f'"{vc_firm}" investment focus areas'
+    ]
@@ -1,40 +1,321 @@
+import json
 import requests
-from typing import List, Dict
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import List, Dict, Optional, Tuple
 from config import Config
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.key_pool import get_key_pool, retry_after_seconds
+from utils.search_result import SearchResult
+from utils.scheduler import get_scheduler, propagate
+from utils.transport import Transport, TransportError
+from tools.query_planner import QueryPlan, normalize_query, person_queries, company_queries, social_queries
 
 class WebSearchTool:
-    def __init__(self):
-        self.api_key = Config.JINA_API_KEY
+    def __init__(self, transport: Transport = None):
+        # Requests are spread over the configured Jina keys by remaining quota
+        self.key_pool = get_key_pool('jina')
+        # Live calls by default; recording and replaying transports wrap them
+        self.transport = transport or Transport()
         self.base_url = Config.JINA_SEARCH_URL
+        self.reader_url = Config.JINA_READER_URL
+        # Response bytes received from Jina, for comparing one- and two-phase search
+        self.bytes_transferred = 0
+        self._bytes_lock = threading.Lock()
+        # Speculative searches started before they were asked for: key -> (max_results, future)
+        self._prefetched = {}
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_executor = None
+        # Searches in flight, key -> (max_results, future), and recent results, key -> (max_results, expiry, results)
+        self._in_flight = {}
+        self._recent = OrderedDict()
+        self._shared_lock = threading.Lock()
         
-    def search(self, query: str, max_results: int = None) -> List[Dict]:
-        """Search the web using Jina API"""
+    def search(self, query: str, max_results: int = None, fetch_content: bool = True,
+               deadline: Deadline = None) -> List[SearchResult]:
+        """Search the web using Jina API
+        
+        With fetch_content=False only titles, URLs and snippets are returned; the
+        snippet is used as the result content until fetch_contents() fills it in.
+        """
         if not max_results:
             max_results = Config.MAX_SEARCH_RESULTS
+        
+        prefetched = self._take_prefetched(query, max_results, fetch_content, deadline)
+        if prefetched is not None:
+            return prefetched
+        
+        return self._search_shared(query, max_results, fetch_content, deadline)
+    
+    def _search_shared(self, query: str, max_results: int, fetch_content: bool,
+                       deadline: Deadline = None) -> List[SearchResult]:
+        """Search, sharing the request with an equivalent search in flight or answered recently
+        
+        Queries built from the same canonical entity names (see EntityNormalizer) are
+        equivalent, so batch rows spelling a company differently search it once.
+        Every caller gets its own copies of the results, which analysis may release.
+        """
+        key = (normalize_query(query), fetch_content)
+        with self._shared_lock:
+            recent = self._recent.get(key)
+            if recent is not None and recent[0] >= max_results and recent[1] > time.monotonic():
+                self._recent.move_to_end(key)
+                return [result.copy() for result in recent[2][:max_results]]
             
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None and in_flight[0] >= max_results:
+                future, owner = in_flight[1], False
+            else:
+                future, owner = Future(), True
+                self._in_flight[key] = (max_results, future)
+        
+        if not owner:
+            try:
+                shared = future.result(timeout=Deadline.coerce(deadline).remaining())
+            except FutureTimeoutError:
+                print(f"Search skipped, deadline reached: {query}")
+                return []
+            return [result.copy() for result in shared[:max_results]]
+        
+        try:
+            results = self._search(query, max_results, fetch_content, deadline)
+        except BaseException as e:
+            self._finish_shared(key, future)
+            future.set_exception(e)
+            raise
+        
+        # A pristine copy for the other callers, since the caller's results get mutated
+        shared = [result.copy() for result in results]
+        self._finish_shared(key, future, max_results, shared)
+        future.set_result(shared)
+        return results
+    
+    def _search(self, query: str, max_results: int, fetch_content: bool,
+                deadline: Deadline = None) -> List[SearchResult]:
+        """Send one search request to Jina"""
         headers = {
-            'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+        if not fetch_content:
+            headers['Accept'] = 'application/json'
+            headers['X-Respond-With'] = 'no-content'
         
-        # Use Jina's search format
+        # Use Jina's search format, asking only for as many results as we will keep
         search_url = f"{self.base_url}{query}"
+        params = {'num': max_results}
         
         try:
-            response = requests.get(search_url, headers=headers)
-            response.raise_for_status()
+            content = self._get(search_url, headers, params, deadline=deadline)
             
             # Parse Jina response
-            content = response.text
-            results = self._parse_jina_response(content, query)
+            if fetch_content:
+                results = self._parse_jina_response(content, query)
+            else:
+                results = self._parse_jina_metadata(content, query)
             
             return results[:max_results]
             
-        except requests.RequestException as e:
+        except DeadlineExceeded:
+            print(f"Search skipped, deadline reached: {query}")
+            return []
+        except (requests.RequestException, TransportError) as e:
             print(f"Search error: {e}")
             return []
     
-    def _parse_jina_response(self, content: str, query: str) -> List[Dict]:
+    def _finish_shared(self, key: Tuple[str, bool], future: Future, max_results: int = None,
+                       results: List[SearchResult] = None) -> None:
+        """Retire an in-flight search, keeping non-empty results for later equivalent searches"""
+        with self._shared_lock:
+            if results and Config.SEARCH_CACHE_ENTRIES:
+                self._recent[key] = (max_results, time.monotonic() + Config.SEARCH_CACHE_SECONDS, results)
+                self._recent.move_to_end(key)
+                while len(self._recent) > Config.SEARCH_CACHE_ENTRIES:
+                    self._recent.popitem(last=False)
+            if self._in_flight.get(key, (None, None))[1] is future:
+                del self._in_flight[key]
+    
+    def prefetch(self, queries: List[Tuple[str, int]]) -> None:
+        """Start searches in the background before anyone asks for them
+        
+        A later search() for an equivalent query with no more results picks up the
+        prefetched results (once) instead of sending a new request.
+        """
+        fetch_content = not Config.TWO_PHASE_SEARCH
+        with self._prefetch_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(max_workers=Config.SEARCH_CONCURRENCY)
+            
+            for query, max_results in queries:
+                key = (normalize_query(query), fetch_content)
+                if key in self._prefetched and self._prefetched[key][0] >= max_results:
+                    continue
+                future = self._prefetch_executor.submit(propagate(self._search), query, max_results, fetch_content)
+                self._prefetched[key] = (max_results, future)
+    
+    def cancel_prefetch(self) -> None:
+        """Drop every speculative search that has not been used; queued ones never run"""
+        with self._prefetch_lock:
+            for _, future in self._prefetched.values():
+                future.cancel()
+            self._prefetched.clear()
+    
+    def close(self) -> None:
+        """Cancel speculative work and stop the prefetch threads"""
+        self.cancel_prefetch()
+        with self._prefetch_lock:
+            if self._prefetch_executor is not None:
+                self._prefetch_executor.shutdown(wait=False)
+                self._prefetch_executor = None
+    
+    def _take_prefetched(self, query: str, max_results: int, fetch_content: bool,
+                         deadline: Deadline = None) -> Optional[List[SearchResult]]:
+        """Results of a matching prefetched search, or None when there is none to use"""
+        with self._prefetch_lock:
+            key = (normalize_query(query), fetch_content)
+            entry = self._prefetched.get(key)
+            if entry is None or entry[0] < max_results:
+                return None
+            del self._prefetched[key]
+        
+        try:
+            return entry[1].result(timeout=Deadline.coerce(deadline).remaining())[:max_results]
+        except FutureTimeoutError:
+            print(f"Search skipped, deadline reached: {query}")
+            return []
+        except CancelledError:
+            return None
+    
+    def fetch_contents(self, results: List[Dict], max_bytes: int = None,
+                       deadline: Deadline = None) -> List[Dict]:
+        """Fetch full page content for search results through the Jina reader, concurrently
+        
+        Pages that are not read before the deadline keep their snippet as content.
+        """
+        max_bytes = max_bytes or Config.MAX_PAGE_BYTES
+        pending = [result for result in results if result.get('url') and not result.get('content_fetched')]
+        if not pending:
+            return results
+        
+        pages = self._run_concurrently(
+            [lambda url=result['url']: self._read_page(url, max_bytes, deadline) for result in pending],
+            deadline
+        )
+        
+        for result, page in zip(pending, pages):
+            if page:
+                result['content'] = page
+                result['content_fetched'] = True
+        
+        return results
+    
+    def _read_page(self, url: str, max_bytes: int, deadline: Deadline = None) -> str:
+        """Read one page through the Jina reader, stopping after max_bytes"""
+        headers = {
+            'X-Retain-Images': 'none'
+        }
+        try:
+            return self._get(f"{self.reader_url}{url}", headers, max_bytes=max_bytes, deadline=deadline)
+        except DeadlineExceeded:
+            return ""
+        except (requests.RequestException, TransportError) as e:
+            print(f"Page fetch error for {url}: {e}")
+            return ""
+    
+    def _get(self, url: str, headers: Dict, params: Dict = None, max_bytes: int = None,
+             deadline: Deadline = None) -> str:
+        """GET a Jina endpoint, optionally truncating the body at max_bytes"""
+        deadline = Deadline.coerce(deadline)
+        
+        # Wait for a Jina slot in this run's priority class before the timeout starts
+        with get_scheduler('jina').slot(deadline):
+            body = self.transport.call(
+                'jina',
+                {'url': url, 'params': params, 'max_bytes': max_bytes, 'accept': headers.get('Accept'),
+                 'respond_with': headers.get('X-Respond-With')},
+                lambda: self._http_get(url, headers, params, max_bytes, deadline),
+                deadline
+            )
+        
+        with self._bytes_lock:
+            self.bytes_transferred += len(body.encode('utf-8'))
+        
+        return body
+    
+    def _http_get(self, url: str, headers: Dict, params: Dict, max_bytes: Optional[int],
+                  deadline: Deadline) -> str:
+        """The live HTTP request behind _get, moving to another key when one is rate limited"""
+        if not len(self.key_pool):
+            raise requests.RequestException("No Jina API key configured")
+        tried = []
+        while True:
+            key = self.key_pool.acquire(deadline, exclude=tried)
+            tried.append(key)
+            try:
+                body = self._http_get_with_key(url, dict(headers, Authorization=f'Bearer {key}'), params,
+                                               max_bytes, deadline)
+                self.key_pool.succeeded(key)
+                return body
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 429:
+                    self.key_pool.failed(key)
+                    raise
+                self.key_pool.rate_limited(key, retry_after_seconds(e.response.headers.get('Retry-After')))
+                if len(tried) >= len(self.key_pool):
+                    raise
+            except requests.RequestException:
+                self.key_pool.failed(key)
+                raise
+    
+    def _http_get_with_key(self, url: str, headers: Dict, params: Dict, max_bytes: Optional[int],
+                           deadline: Deadline) -> str:
+        """One HTTP request to Jina with the given credentials"""
+        stream = max_bytes is not None or deadline.remaining() is not None
+        timeout = deadline.timeout(Config.HTTP_TIMEOUT)
+        
+        with requests.get(url, headers=headers, params=params, stream=stream, timeout=timeout) as response:
+            response.raise_for_status()
+            
+            if not stream:
+                body = response.content
+            else:
+                chunks = []
+                received = 0
+                for chunk in response.iter_content(chunk_size=16384):
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if max_bytes is not None and received >= max_bytes:
+                        break
+                    if deadline.expired():
+                        # Keep what arrived in time; the caller treats it as a partial page
+                        break
+                body = b''.join(chunks)
+                if max_bytes is not None:
+                    body = body[:max_bytes]
+        
+        return body.decode(response.encoding or 'utf-8', errors='ignore')
+    
+    def _parse_jina_metadata(self, content: str, query: str) -> List[SearchResult]:
+        """Parse a no-content Jina JSON response into title/url/snippet results"""
+        try:
+            data = json.loads(content).get('data') or []
+        except (ValueError, AttributeError):
+            # Not JSON; fall back to the text format
+            return self._parse_jina_response(content, query)
+        
+        results = []
+        for item in data:
+            snippet = item.get('description') or ''
+            results.append(SearchResult(
+                title=item.get('title', ''),
+                url=item.get('url', ''),
+                content=snippet,
+                snippet=snippet
+            ))
+        return results
+    
+    def _parse_jina_response(self, content: str, query: str) -> List[SearchResult]:
         """Parse Jina API response into structured format"""
         # Simple parsing - you might need to adjust based on actual Jina response format
         lines = content.split('\n')
@@ -58,17 +339,11 @@ class WebSearchTool:
         if current_result:
             results.append(current_result)
             
-        return results
+        return [SearchResult.from_dict(result) for result in results]
     
     def search_person(self, name: str, company: str = None) -> List[Dict]:
         """Search for information about a person"""
-        queries = [
-            f'"{name}" bio profile',
-            f'"{name}" background experience',
-        ]
-        
-        if company:
-            queries.append(f'"{name}" "{company}"')
+        queries = person_queries(name, company)
             
         all_results = []
         for query in queries:
@@ -79,11 +354,7 @@ class WebSearchTool:
     
     def search_company(self, company: str) -> List[Dict]:
         """Search for information about a company"""
-        queries = [
-            f'"{company}" company about',
-            f'"{company}" business model',
-            f'"{company}" funding investment'
-        ]
+        queries = company_queries(company)
         
         all_results = []
         for query in queries:
@@ -94,12 +365,7 @@ class WebSearchTool:
     
     def search_social_content(self, name: str) -> List[Dict]:
         """Search for social media content and blogs"""
-        queries = [
-            f'"{name}" twitter tweet',
-            f'"{name}" blog post article',
-            f'"{name}" linkedin post',
-            f'"{name}" medium article'
-        ]
+        queries = social_queries(name)
         
         all_results = []
         for query in queries:
@@ -108,6 +374,149 @@ class WebSearchTool:
             
         return self._deduplicate_results(all_results)
     
+    def run_plan(self, plan: QueryPlan, deadline: Deadline = None) -> Dict[str, List[Dict]]:
+        """Execute a query plan and route each result to the groups that asked for it
+        
+        Groups whose queries could not run before the deadline are recorded in
+        plan.incomplete_groups and get whatever results arrived in time.
+        """
+        deadline = Deadline.coerce(deadline)
+        unique_queries = plan.unique()
+        
+        if plan.targets:
+            # Budgeted plans run in order so later queries can be skipped
+            batches = [[unique] for unique in unique_queries]
+        else:
+            batches = [unique_queries]
+        
+        grouped = {group: [] for group in plan.groups()}
+        fallback = {group: [] for group in grouped}
+        # group -> url -> (query number, rank in that query's results) for each query that returned it
+        appearances = {group: {} for group in grouped}
+        plan.executed = 0
+        
+        for batch in batches:
+            pending = [unique for unique in batch if self._still_needed(plan, unique, grouped)]
+            if not pending:
+                continue
+            
+            if deadline.expired():
+                for unique in pending:
+                    plan.incomplete_groups.update(unique.groups)
+                continue
+            
+            plan.executed += len(pending)
+            for unique, results in zip(pending, self._search_many(pending, deadline)):
+                if results is None:
+                    plan.incomplete_groups.update(unique.groups)
+                    continue
+                query_number = unique_queries.index(unique)
+                for group in unique.groups:
+                    for position, result in enumerate(results):
+                        url = result.get('url', '')
+                        if not url:
+                            continue
+                        if url in appearances[group]:
+                            appearances[group][url].append((query_number, position))
+                            continue
+                        appearances[group][url] = [(query_number, position)]
+                        
+                        if plan.is_relevant(group, result):
+                            grouped[group].append(result)
+                        else:
+                            fallback[group].append(result)
+        
+        for group in grouped:
+            target = plan.targets.get(group)
+            if target is None:
+                grouped[group].extend(fallback[group])
+            else:
+                # Top up with less relevant results only when the plan ran dry
+                grouped[group] = (grouped[group] + fallback[group])[:target]
+        
+        if Config.TWO_PHASE_SEARCH:
+            # Phase two: full content only for the best-ranked results of each group;
+            # the rest stay in the group as snippet-only sources
+            selected = {}
+            for group in grouped:
+                grouped[group] = self._rank_results(plan, group, grouped[group], appearances[group])
+                selected[group] = grouped[group][:plan.content_limit(group)]
+            self._fetch_grouped_contents(selected, deadline)
+            for group in grouped:
+                grouped[group] = selected[group] + grouped[group][len(selected[group]):]
+        
+        return grouped
+    
+    def _rank_results(self, plan: QueryPlan, group: str, results: List[Dict],
+                      appearances: Dict[str, List]) -> List[Dict]:
+        """Order a group's metadata results by how worth fetching they are
+        
+        Results mentioning the group's entity come first, then those returned by
+        more of the group's queries. Ties go round-robin across the queries: every
+        query's first result, then every query's second, so no query is crowded out
+        by the one that happened to run first.
+        """
+        def score(result):
+            hits = appearances.get(result.get('url', ''), [(0, 0)])
+            first_query, best_position = min(hits, key=lambda hit: (hit[1], hit[0]))
+            return (not plan.is_relevant(group, result), -len(hits), best_position, first_query)
+        
+        return sorted(results, key=score)
+    
+    def _fetch_grouped_contents(self, grouped: Dict[str, List[Dict]], deadline: Deadline = None) -> None:
+        """Fetch content once per URL even when several groups selected it"""
+        by_url = {}
+        for results in grouped.values():
+            for result in results:
+                by_url.setdefault(result.get('url', ''), result)
+        
+        self.fetch_contents(list(by_url.values()), deadline=deadline)
+        
+        for group, results in grouped.items():
+            grouped[group] = [
+                result if result is by_url.get(result.get('url', '')) else by_url[result['url']].copy()
+                for result in results
+            ]
+    
+    def _still_needed(self, plan: QueryPlan, unique, grouped: Dict[str, List[Dict]]) -> bool:
+        """A query is skipped once every group it feeds has reached its target"""
+        for group in unique.groups:
+            target = plan.targets.get(group)
+            if target is None or len(grouped[group]) < target:
+                return True
+        return False
+    
+    def _search_many(self, queries: List, deadline: Deadline = None) -> List[Optional[List[Dict]]]:
+        """Run several queries concurrently, returning results in query order
+        
+        Queries still running at the deadline are abandoned and reported as None.
+        """
+        fetch_content = not Config.TWO_PHASE_SEARCH
+        if len(queries) == 1:
+            return [self.search(queries[0].query, queries[0].max_results, fetch_content, deadline)]
+        
+        return self._run_concurrently(
+            [
+                lambda unique=unique: self.search(unique.query, unique.max_results, fetch_content, deadline)
+                for unique in queries
+            ],
+            deadline
+        )
+    
+    def _run_concurrently(self, calls: List, deadline: Deadline = None) -> List:
+        """Run calls on a thread pool, giving up on those still running at the deadline"""
+        deadline = Deadline.coerce(deadline)
+        executor = ThreadPoolExecutor(max_workers=Config.SEARCH_CONCURRENCY)
+        futures = [executor.submit(propagate(call)) for call in calls]
+        try:
+            wait(futures, timeout=deadline.remaining())
+            return [future.result() if future.done() else None for future in futures]
+        finally:
+            # Queued calls are cancelled; calls in flight are bounded by their own timeouts
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
     def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
         """Remove duplicate results based on URL"""
         seen_urls = set()
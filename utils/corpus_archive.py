@@ -0,0 +1,253 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from config import Config
+from tools.query_planner import normalize_query
+from utils.entity_normalizer import company_key, person_key, rekey_if_stale
+from utils.search_result import SearchResult
+
+# Fields of a search result worth keeping; the domain is derived from the URL
+RESULT_FIELDS = ('title', 'url', 'content', 'snippet', 'content_fetched')
+
+
+class CorpusArchive:
+    """Append-only store of raw search results, for re-analysis without searching again
+
+    Each research run writes one compressed record per result group to the current
+    segment file; segments are never rewritten and roll over at CORPUS_SEGMENT_BYTES.
+    A SQLite index maps runs (by person, company and mode) and queries to record
+    offsets, and records are read back through memory-mapped segments.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS corpus_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        person TEXT NOT NULL,
+        company TEXT NOT NULL,
+        person_key TEXT NOT NULL,
+        company_key TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        incomplete_groups TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_corpus_runs_entity
+        ON corpus_runs (person_key, company_key, created_at DESC);
+    CREATE TABLE IF NOT EXISTS corpus_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id INTEGER NOT NULL REFERENCES corpus_runs (id),
+        group_name TEXT NOT NULL,
+        segment INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        result_count INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_corpus_records_run ON corpus_records (run_id);
+    CREATE TABLE IF NOT EXISTS corpus_queries (
+        record_id INTEGER NOT NULL REFERENCES corpus_records (id),
+        query TEXT NOT NULL,
+        query_key TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_corpus_queries_key ON corpus_queries (query_key);
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or Config.CORPUS_PATH
+        os.makedirs(self.directory, exist_ok=True)
+        self.db_path = os.path.join(self.directory, 'index.db')
+        self._write_lock = threading.Lock()
+        self._maps: 'OrderedDict[int, mmap.mmap]' = OrderedDict()
+        self._maps_lock = threading.Lock()
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript(self.SCHEMA)
+                columns = [row['name'] for row in conn.execute("PRAGMA table_info(corpus_runs)")]
+                if 'incomplete_groups' not in columns:
+                    # Archives from before runs cut short by the deadline were flagged
+                    conn.execute("ALTER TABLE corpus_runs ADD COLUMN incomplete_groups TEXT NOT NULL DEFAULT ''")
+            rekey_if_stale(conn, 'corpus_runs')
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.bin")
+
+    def append(self, mode: str, person: str, company: str, results: Dict[str, List[Dict]],
+               queries: Dict[str, List[str]] = None, incomplete_groups: Iterable[str] = ()) -> int:
+        """Archive one run's results per group, with the queries that fed each group; returns the run id
+
+        incomplete_groups are the groups whose searches the run's deadline cut short.
+        """
+        records = []
+        for group, group_results in results.items():
+            payload = json.dumps(
+                [{field: result.get(field) for field in RESULT_FIELDS} for result in group_results],
+                ensure_ascii=False
+            ).encode('utf-8')
+            records.append((group, zlib.compress(payload, 6), len(group_results)))
+
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    cursor = conn.execute(
+                        "INSERT INTO corpus_runs (person, company, person_key, company_key, mode, created_at, "
+                        "incomplete_groups) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (person, company, person_key(person), company_key(company), mode,
+                         datetime.now().isoformat(timespec='seconds'), ','.join(sorted(incomplete_groups)))
+                    )
+                    run_id = cursor.lastrowid
+
+                    for group, blob, count in records:
+                        segment, offset = self._write(blob)
+                        cursor = conn.execute(
+                            "INSERT INTO corpus_records (run_id, group_name, segment, offset, length, result_count) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (run_id, group, segment, offset, len(blob), count)
+                        )
+                        conn.executemany(
+                            "INSERT INTO corpus_queries (record_id, query, query_key) VALUES (?, ?, ?)",
+                            [(cursor.lastrowid, query, normalize_query(query))
+                             for query in (queries or {}).get(group, [])]
+                        )
+                return run_id
+            finally:
+                conn.close()
+
+    def _write(self, blob: bytes):
+        """Append a record to the current segment, starting a new one when it is full"""
+        segments = sorted(
+            int(name[len('segment-'):-len('.bin')])
+            for name in os.listdir(self.directory)
+            if name.startswith('segment-') and name.endswith('.bin')
+        )
+        segment = segments[-1] if segments else 1
+        path = self._segment_path(segment)
+        if os.path.exists(path) and os.path.getsize(path) + len(blob) > Config.CORPUS_SEGMENT_BYTES:
+            segment += 1
+            path = self._segment_path(segment)
+
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        return segment, offset
+
+    def _read(self, segment: int, offset: int, length: int) -> List[Dict]:
+        """Decompress one record through a memory map of its segment"""
+        with self._maps_lock:
+            mapped = self._maps.get(segment)
+            if mapped is None or offset + length > len(mapped):
+                # New segment, or the segment grew since it was mapped
+                if mapped is not None:
+                    mapped.close()
+                with open(self._segment_path(segment), 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = mapped
+            self._maps.move_to_end(segment)
+            while len(self._maps) > Config.CORPUS_OPEN_SEGMENTS:
+                self._maps.popitem(last=False)[1].close()
+
+            blob = mapped[offset:offset + length]
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def load(self, run_id: int) -> Optional[Dict]:
+        """One archived run with its results per group, as SearchResult records"""
+        conn = self._connect()
+        try:
+            run = conn.execute("SELECT * FROM corpus_runs WHERE id = ?", (run_id,)).fetchone()
+            if run is None:
+                return None
+            records = conn.execute(
+                "SELECT * FROM corpus_records WHERE run_id = ? ORDER BY id", (run_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        corpus = self._run_to_dict(run)
+        corpus['results'] = {
+            record['group_name']: [
+                SearchResult.from_dict(result)
+                for result in self._read(record['segment'], record['offset'], record['length'])
+            ]
+            for record in records
+        }
+        return corpus
+
+    def _run_to_dict(self, row: sqlite3.Row) -> Dict:
+        run = dict(row)
+        run['incomplete_groups'] = [group for group in run['incomplete_groups'].split(',') if group]
+        return run
+
+    def runs(self, person: str = None, company: str = None, mode: str = None,
+             max_age_days: float = None, limit: int = None, complete_only: bool = False) -> List[Dict]:
+        """Archived runs matching the filters, oldest first, without their results
+
+        With complete_only, runs whose searches were cut short by the deadline are left out.
+        """
+        clauses, params = [], []
+        if person:
+            clauses.append("person_key = ?")
+            params.append(person_key(person))
+        if company:
+            clauses.append("company_key = ?")
+            params.append(company_key(company))
+        if mode:
+            clauses.append("mode = ?")
+            params.append(mode)
+        if max_age_days is not None:
+            clauses.append("created_at >= ?")
+            params.append((datetime.now() - timedelta(days=max_age_days)).isoformat(timespec='seconds'))
+        if complete_only:
+            clauses.append("incomplete_groups = ''")
+
+        sql = "SELECT * FROM corpus_runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        conn = self._connect()
+        try:
+            return [self._run_to_dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def find_query(self, query: str) -> List[Dict]:
+        """Archived result groups fed by an equivalent query, newest first"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT r.id AS record_id, r.group_name, r.result_count, q.query, "
+                "runs.id AS run_id, runs.person, runs.company, runs.mode, runs.created_at "
+                "FROM corpus_queries q "
+                "JOIN corpus_records r ON r.id = q.record_id "
+                "JOIN corpus_runs runs ON runs.id = r.run_id "
+                "WHERE q.query_key = ? ORDER BY runs.created_at DESC",
+                (normalize_query(query),)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        with self._maps_lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
@@ -19,6 +19,12 @@ class DataProcessor:
             }
         }
         
+        # Sections cut short by a run deadline
+        processed_data['metadata']['incomplete_sections'] = [
+            section for section in ('person', 'company', 'insights')
+            if processed_data[section].get('incomplete')
+        ]
+        
         return processed_data
     
     def _process_person_data(self, person_data: Dict) -> Dict:
@@ -32,7 +38,8 @@ class DataProcessor:
             'type': analysis.get('type', 'unknown'),
             'analysis': self._clean_text(analysis.get('analysis', '')),
             'key_points': self._extract_key_points(analysis.get('analysis', '')),
-            'sources_count': len(person_data.get('raw_results', []))
+            'sources_count': len(person_data.get('raw_results', [])),
+            'incomplete': bool(analysis.get('incomplete', False))
         }
     
     def _process_company_data(self, company_data: Dict) -> Dict:
@@ -45,7 +52,8 @@ class DataProcessor:
             'type': analysis.get('type', 'unknown'),
             'analysis': self._clean_text(analysis.get('analysis', '')),
             'key_points': self._extract_key_points(analysis.get('analysis', '')),
-            'sources_count': len(company_data.get('raw_results', []))
+            'sources_count': len(company_data.get('raw_results', [])),
+            'incomplete': bool(analysis.get('incomplete', False))
         }
     
     def _process_insights_data(self, insights_data: Dict) -> Dict:
@@ -56,7 +64,8 @@ class DataProcessor:
         return {
             'insights': self._clean_text(social_analysis.get('insights', '')),
             'key_opinions': self._extract_opinions(social_analysis.get('insights', '')),
-            'sources_count': len(insights_data.get('raw_results', []))
+            'sources_count': len(insights_data.get('raw_results', [])),
+            'incomplete': bool(social_analysis.get('incomplete', False))
         }
     
     def _clean_text(self, text: str) -> str:
@@ -0,0 +1,39 @@
+from typing import Optional
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage is started or continued after the run's deadline"""
+
+
+class Deadline:
+    """Remaining time budget for a research run, passed down to every search and LLM call"""
+
+    def __init__(self, seconds: float = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    @classmethod
+    def coerce(cls, deadline) -> 'Deadline':
+        """Accept a Deadline, a number of seconds or None"""
+        if isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when the run is unbounded"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, cap: float = None) -> Optional[float]:
+        """Timeout for the next call: the remaining budget, never more than cap"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s exceeded")
+        return min(remaining, cap) if cap is not None else remaining
@@ -0,0 +1,126 @@
+import re
+import zlib
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+import numpy as np
+from config import Config
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+# Words that say nothing about which company is meant
+COMPANY_STOPWORDS = frozenset(
+    "inc inc. llc ltd limited corp corporation co company companies group holdings the and of gmbh plc "
+    "www com io ai co net org".split()
+)
+
+
+class NameDisambiguator:
+    """Drops search results about other people who share the target's name
+
+    Every result is turned into a hashed word unigram/bigram vector. Results that
+    name both the person and their company are treated as confirmed; the others are
+    kept only if they are close enough (cosine similarity) to the confirmed ones.
+    """
+
+    def __init__(self, threshold: float = None, hash_bits: int = None, max_chars: int = None):
+        self.threshold = Config.DISAMBIGUATION_THRESHOLD if threshold is None else threshold
+        self.dimensions = 1 << (hash_bits or Config.DISAMBIGUATION_HASH_BITS)
+        self.max_chars = max_chars or Config.DISAMBIGUATION_MAX_CHARS
+
+    def filter(self, results: List[Dict], name: str, company: str = None,
+               confirmed: List[Dict] = None, keep_company_results: bool = False) -> Tuple[List[Dict], List[Dict]]:
+        """Split results into (kept, dropped); every dropped entry records why
+
+        confirmed are results already known to be about the target (from an
+        earlier stage, say); they anchor the similarity comparison. With
+        keep_company_results, results that name the company but not the person are
+        kept, for groups that also search the company itself.
+        """
+        if not results:
+            return [], []
+
+        name_tokens = _WORD.findall(name.lower())
+        company_tokens = self._company_tokens(company)
+        texts = [self._text(result) for result in results]
+        word_sets = [set(_WORD.findall(text)) for text in texts]
+
+        # Without the surname (or the only name given) the result cannot be about the target
+        surname = name_tokens[-1:] if name_tokens else []
+        names_person = np.array([all(token in words for token in surname) for words in word_sets])
+        full_name = np.array([all(token in words for token in name_tokens) for words in word_sets])
+        names_company = np.array([
+            bool(company_tokens) and all(token in words for token in company_tokens)
+            for words in word_sets
+        ])
+
+        anchors = full_name & names_company
+        confirmed_texts = [self._text(result) for result in confirmed or []]
+        matrix = self._vectorize(texts + confirmed_texts)
+        result_vectors, confirmed_vectors = matrix[:len(texts)], matrix[len(texts):]
+
+        profile = np.vstack([result_vectors[anchors], confirmed_vectors]).sum(axis=0)
+        norm = np.linalg.norm(profile)
+        if norm > 0:
+            similarity = result_vectors @ (profile / norm)
+        else:
+            # Nothing confirmed yet: similarity cannot tell namesakes apart
+            similarity = np.ones(len(results), dtype=np.float32)
+
+        kept, dropped = [], []
+        for index, result in enumerate(results):
+            score = float(similarity[index])
+            if not names_person[index]:
+                if keep_company_results and names_company[index]:
+                    kept.append(result)
+                    continue
+                reason = f"does not mention '{name}'"
+            elif anchors[index] or names_company[index] or score >= self.threshold:
+                kept.append(result)
+                continue
+            else:
+                reason = f"likely a different {name}: similarity {score:.2f} below {self.threshold:.2f}"
+            dropped.append({
+                'url': result.get('url', ''),
+                'title': result.get('title', ''),
+                'score': round(score, 3),
+                'reason': reason
+            })
+
+        return kept, dropped
+
+    def _text(self, result: Dict) -> str:
+        return f"{result.get('title', '')} {result.get('url', '')} {result.get('content', '')[:self.max_chars]}".lower()
+
+    def _company_tokens(self, company: str) -> List[str]:
+        """Significant words of a company name or website"""
+        if not company:
+            return []
+        if '.' in company and ' ' not in company.strip():
+            # A website: keep the registrable name ("acme" from "https://www.acme.io/about")
+            host = urlparse(company if '//' in company else f"//{company}").netloc or company
+            company = host.split(':')[0].rsplit('.', 1)[0]
+        return [token for token in _WORD.findall(company.lower())
+                if token not in COMPANY_STOPWORDS and len(token) > 1]
+
+    def _vectorize(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized hashed unigram + bigram counts, one row per text"""
+        hashes = {}
+        rows, columns = [], []
+        mask = self.dimensions - 1
+
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text)
+            for feature in words + [f"{first} {second}" for first, second in zip(words, words[1:])]:
+                column = hashes.get(feature)
+                if column is None:
+                    column = hashes[feature] = zlib.crc32(feature.encode('utf-8')) & mask
+                rows.append(row)
+                columns.append(column)
+
+        cells = np.array(rows, dtype=np.int64) * self.dimensions + np.array(columns, dtype=np.int64)
+        counts = np.bincount(cells, minlength=len(texts) * self.dimensions)
+        matrix = np.log1p(counts.reshape(len(texts), self.dimensions).astype(np.float32))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return matrix
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List
+from urllib.parse import urlparse
+from config import Config
+
+# Trailing words that only state a company's legal form
+LEGAL_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'llc', 'llp', 'lp', 'ltd', 'limited',
+    'plc', 'gmbh', 'ag', 'sa', 'sas', 'sarl', 'srl', 'spa', 'bv', 'nv', 'oy', 'ab', 'pty', 'kk', 'pbc'
+}
+
+# Titles before and qualifications after a person's name
+PERSON_PREFIXES = {'dr', 'mr', 'mrs', 'ms', 'mx', 'prof', 'sir', 'dame'}
+PERSON_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'phd', 'md', 'mba', 'cfa', 'cpa', 'esq'}
+
+# Two-label public suffixes, so "acme.co.uk" maps to "acme" like "acme.com"
+SECOND_LEVEL_DOMAINS = {'co', 'com', 'net', 'org', 'ac', 'gov', 'edu'}
+
+# Bumped when entity keys are computed differently, so stored keys get recomputed
+KEY_VERSION = 1
+
+_URL_PATTERN = re.compile(r'^(https?://|www\.)|^[\w-]+(\.[\w-]+)*\.[a-z]{2,}(/\S*)?$', re.IGNORECASE)
+
+
+def _words(name: str) -> List[str]:
+    """Case-folded words of a name, accents, punctuation and '&' spelled out or dropped"""
+    text = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = text.replace('&', ' and ')
+    # Dotted abbreviations ("L.L.C.", "S.A.") become one word before punctuation is dropped
+    text = re.sub(r'\b(\w)\.(?=\w\.)', r'\1', text)
+    return re.findall(r'\w+', text)
+
+
+def domain_name(url: str) -> str:
+    """The registrable name in a website address: "https://www.acme.co.uk/about" -> "acme" """
+    if '://' not in url:
+        url = f"http://{url}"
+    labels = (urlparse(url).hostname or '').split('.')
+    if labels and labels[0] == 'www':
+        labels = labels[1:]
+    if len(labels) >= 3 and labels[-2] in SECOND_LEVEL_DOMAINS:
+        labels = labels[:-2]
+    elif len(labels) >= 2:
+        labels = labels[:-1]
+    return labels[-1] if labels else ''
+
+
+class EntityNormalizer:
+    """Maps the spellings of a person or company to one canonical key
+
+    Keys are case-folded and accent-free; company keys also drop legal suffixes
+    ("Acme, Inc." -> "acme") and map websites to their domain name
+    ("https://acme.com" -> "acme"). The alias table maps other names to a canonical
+    one, e.g. a former name or a brand. Archives, the search cache and batch
+    research all compare entities by these keys.
+    """
+
+    def __init__(self, aliases_path: str = None):
+        self._aliases: Dict[str, Dict[str, str]] = {'person': {}, 'company': {}}
+        # First spelling seen for each key, used as the display name of later spellings
+        self._spellings: Dict[str, Dict[str, str]] = {'person': {}, 'company': {}}
+        self._lock = threading.Lock()
+
+        path = aliases_path or Config.ENTITY_ALIASES_PATH
+        if path and os.path.exists(path):
+            self.load_aliases(path)
+
+    def load_aliases(self, path: str) -> None:
+        """Read an alias table: {"companies": {"Canonical": ["alias", ...]}, "people": {...}}"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                table = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading entity aliases from {path}: {e}")
+            return
+
+        for kind, section in (('company', 'companies'), ('person', 'people')):
+            for canonical, aliases in (table.get(section) or {}).items():
+                for alias in aliases:
+                    self.add_alias(kind, alias, canonical)
+
+    def add_alias(self, kind: str, alias: str, canonical: str) -> None:
+        """Treat alias as another name of canonical ('person' or 'company')"""
+        with self._lock:
+            self._aliases[kind][self._normalize(kind, alias)] = canonical
+
+    def person_key(self, name: str) -> str:
+        return self.key('person', name)
+
+    def company_key(self, name: str) -> str:
+        return self.key('company', name)
+
+    def key(self, kind: str, name: str) -> str:
+        """Canonical key of a person or company name"""
+        normalized = self._normalize(kind, name)
+        canonical = self._aliases[kind].get(normalized)
+        return self._normalize(kind, canonical) if canonical else normalized
+
+    def canonical(self, kind: str, name: str) -> str:
+        """Display spelling for a name: its alias target, or the first spelling seen with the same key
+
+        Equivalent names then produce identical search queries, so they share
+        cached and in-flight searches.
+        """
+        normalized = self._normalize(kind, name)
+        with self._lock:
+            canonical = self._aliases[kind].get(normalized)
+            if canonical:
+                return canonical
+            return self._spellings[kind].setdefault(normalized, ' '.join((name or '').split()))
+
+    def fingerprint(self) -> str:
+        """Changes whenever the keys this normalizer computes may change: new rules or a new alias table"""
+        with self._lock:
+            table = json.dumps(self._aliases, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{KEY_VERSION}\n{table}".encode('utf-8')).hexdigest()
+
+    def _normalize(self, kind: str, name: str) -> str:
+        name = (name or '').strip()
+        if kind == 'company':
+            if _URL_PATTERN.match(name):
+                name = domain_name(name)
+            words = _words(name)
+            # "Acme & Co." leaves a dangling "and" once "co" is gone
+            while len(words) > 1 and (words[-1] in LEGAL_SUFFIXES or words[-1] == 'and'):
+                words.pop()
+            if len(words) > 1 and words[0] == 'the':
+                words = words[1:]
+        else:
+            words = _words(name)
+            while len(words) > 1 and words[0] in PERSON_PREFIXES:
+                words = words[1:]
+            while len(words) > 1 and words[-1] in PERSON_SUFFIXES:
+                words.pop()
+        return ' '.join(words)
+
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def get_entity_normalizer() -> EntityNormalizer:
+    """The process-wide normalizer, with the alias table from Config.ENTITY_ALIASES_PATH"""
+    global _normalizer
+    with _normalizer_lock:
+        if _normalizer is None:
+            _normalizer = EntityNormalizer()
+        return _normalizer
+
+
+def person_key(name: str) -> str:
+    return get_entity_normalizer().person_key(name)
+
+
+def company_key(name: str) -> str:
+    return get_entity_normalizer().company_key(name)
+
+
+def rekey_if_stale(conn: sqlite3.Connection, table: str) -> int:
+    """Recompute a table's person_key and company_key columns if they predate the current keys
+
+    The normalizer's fingerprint is stored in the database next to the table, so
+    rows keyed under older rules or another alias table are recomputed the next
+    time the database is opened. Returns the number of rows that changed.
+    """
+    fingerprint = get_entity_normalizer().fingerprint()
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entity_keys (name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)"
+        )
+    stored = conn.execute("SELECT fingerprint FROM entity_keys WHERE name = ?", (table,)).fetchone()
+    if stored is not None and stored[0] == fingerprint:
+        return 0
+
+    rows = conn.execute(f"SELECT id, person, company, person_key, company_key FROM {table}").fetchall()
+    updates = []
+    for row_id, person, company, stored_person_key, stored_company_key in rows:
+        keys = (person_key(person), company_key(company))
+        if keys != (stored_person_key, stored_company_key):
+            updates.append(keys + (row_id,))
+    with conn:
+        conn.executemany(f"UPDATE {table} SET person_key = ?, company_key = ? WHERE id = ?", updates)
+        conn.execute("INSERT OR REPLACE INTO entity_keys (name, fingerprint) VALUES (?, ?)", (table, fingerprint))
+    if updates:
+        print(f"Recomputed entity keys of {len(updates)} rows in {table}")
+    return len(updates)
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from config import Config
+from utils.deadline import Deadline, DeadlineExceeded
+
+# Requests are counted over a sliding window of this many seconds
+QUOTA_WINDOW = 60.0
+
+
+class _KeyState:
+    """Recent requests, cooldown and lifetime counts of one key"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.window = deque()
+        self.cooldown_until = 0.0
+        self.strikes = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+
+class KeyPool:
+    """API keys for one service, handing each request the key with the most quota left
+
+    Each key may send requests_per_minute requests over a sliding minute. A key the
+    provider answers with 429 cools down for Config.KEY_COOLDOWN_SECONDS (or the
+    provider's Retry-After), doubling on repeated 429s, and gets no requests meanwhile.
+    When every key is spent or cooling, acquire() waits for the first one to free up.
+    """
+
+    def __init__(self, service: str, keys: List[str], requests_per_minute: int = None):
+        self.service = service
+        self.requests_per_minute = requests_per_minute
+        self._keys = {key: _KeyState(key) for key in keys}
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def acquire(self, deadline: Deadline = None, exclude: List[str] = ()) -> str:
+        """Key for the next request, counted against its quota
+
+        Keys in exclude (those that just failed this request) are only used when
+        every key is excluded. Raises DeadlineExceeded if no key frees up in time.
+        """
+        if not self._keys:
+            raise ValueError(f"No {self.service} API keys configured")
+        deadline = Deadline.coerce(deadline)
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                candidates = [state for state in self._keys.values() if state.key not in exclude] \
+                    or list(self._keys.values())
+                available = [state for state in candidates
+                             if state.cooldown_until <= now and self._remaining(state, now) > 0]
+                if available:
+                    # Most quota left first, then the least used key
+                    state = max(available, key=lambda s: (self._remaining(s, now), -s.requests))
+                    state.window.append(now)
+                    state.requests += 1
+                    return state.key
+
+                wait = min(self._free_at(state, now) for state in candidates) - now
+                remaining = deadline.remaining()
+                if remaining is not None and remaining <= wait:
+                    raise DeadlineExceeded(f"Deadline reached while waiting for a {self.service} API key")
+                self._condition.wait(wait)
+
+    def _remaining(self, state: _KeyState, now: float) -> float:
+        """Requests the key may still send in the current window"""
+        while state.window and state.window[0] <= now - QUOTA_WINDOW:
+            state.window.popleft()
+        if self.requests_per_minute is None:
+            return float('inf')
+        return self.requests_per_minute - len(state.window)
+
+    def _free_at(self, state: _KeyState, now: float) -> float:
+        """When the key can take a request again"""
+        free_at = max(state.cooldown_until, now)
+        if self._remaining(state, now) <= 0:
+            free_at = max(free_at, state.window[0] + QUOTA_WINDOW)
+        return free_at
+
+    def succeeded(self, key: str) -> None:
+        with self._condition:
+            self._keys[key].strikes = 0
+
+    def rate_limited(self, key: str, retry_after: float = None) -> None:
+        """The provider refused a request on this key for quota: cool it down"""
+        with self._condition:
+            state = self._keys[key]
+            state.rate_limited += 1
+            cooldown = retry_after or min(Config.KEY_COOLDOWN_SECONDS * 2 ** state.strikes,
+                                          Config.KEY_MAX_COOLDOWN_SECONDS)
+            state.strikes += 1
+            state.cooldown_until = max(state.cooldown_until, time.monotonic() + cooldown)
+            self._condition.notify_all()
+
+    def failed(self, key: str) -> None:
+        """A request on this key failed for another reason; counted, but the key stays in use"""
+        with self._condition:
+            self._keys[key].errors += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Usage per key, labelled by position and the key's last four characters"""
+        with self._condition:
+            now = time.monotonic()
+            stats = {}
+            for number, state in enumerate(self._keys.values(), 1):
+                remaining = self._remaining(state, now)
+                stats[f"#{number} ...{state.key[-4:]}"] = {
+                    'requests': state.requests,
+                    'rate_limited': state.rate_limited,
+                    'errors': state.errors,
+                    'last_minute': len(state.window),
+                    'remaining': None if remaining == float('inf') else remaining,
+                    'cooldown': max(state.cooldown_until - now, 0.0)
+                }
+            return stats
+
+
+_pools: Dict[str, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(service: str) -> KeyPool:
+    """The process-wide key pool for an upstream service ('jina', 'gemini')"""
+    with _pools_lock:
+        if service not in _pools:
+            keys = {'gemini': Config.GEMINI_API_KEYS, 'jina': Config.JINA_API_KEYS}[service]
+            _pools[service] = KeyPool(service, keys, Config.KEY_REQUESTS_PER_MINUTE[service])
+        return _pools[service]
+
+
+def key_pool_stats() -> Dict[str, Dict]:
+    with _pools_lock:
+        pools = dict(_pools)
+    return {service: pool.stats() for service, pool in pools.items()}
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header, when it holds a number"""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,308 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import html
+import json
+import os
+import re
+import sqlite3
+import zlib
+from config import Config
+from utils.entity_normalizer import company_key, person_key, rekey_if_stale
+
+# Bumped when the indexed text is extracted differently, so the full-text index gets rebuilt
+FTS_TEXT_VERSION = 1
+
+
+def searchable_text(report: str, output_format: str = 'markdown') -> str:
+    """The readable text of a rendered report, without HTML markup, styles or JSON keys"""
+    if output_format == 'html':
+        text = re.sub(r'<(style|script)\b.*?</\1\s*>', ' ', report, flags=re.DOTALL | re.IGNORECASE)
+        text = re.sub(r'<[^>]+>', ' ', text)
+        return html.unescape(text)
+    if output_format == 'json':
+        try:
+            data = json.loads(report)
+        except ValueError:
+            return report
+        values = []
+
+        def collect(value):
+            if isinstance(value, str):
+                values.append(value)
+            elif isinstance(value, dict):
+                for item in value.values():
+                    collect(item)
+            elif isinstance(value, list):
+                for item in value:
+                    collect(item)
+
+        collect(data)
+        return '\n'.join(values)
+    return report
+
+
+class ReportArchive:
+    """SQLite store keeping each report with its processed data and search keys"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        person TEXT NOT NULL,
+        company TEXT NOT NULL,
+        person_key TEXT NOT NULL,
+        company_key TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        output_format TEXT NOT NULL,
+        person_type TEXT,
+        company_type TEXT,
+        created_at TEXT NOT NULL,
+        report BLOB NOT NULL,
+        data BLOB
+    );
+    CREATE INDEX IF NOT EXISTS idx_reports_entity
+        ON reports (person_key, company_key, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_reports_created
+        ON reports (created_at DESC);
+    CREATE TABLE IF NOT EXISTS fts_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_indexed_id INTEGER NOT NULL
+    );
+    """
+
+    # Contentless index: report text is already stored (compressed) in the reports table
+    FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+        person, company, report, key_points,
+        content='', tokenize='porter unicode61'
+    );
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.ARCHIVE_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript(self.SCHEMA)
+                conn.execute("INSERT OR IGNORE INTO fts_state (id, last_indexed_id) VALUES (1, 0)")
+            rekey_if_stale(conn, 'reports')
+            try:
+                with conn:
+                    conn.executescript(self.FTS_SCHEMA)
+                    self._rebuild_stale_index(conn)
+                self.fts_enabled = True
+            except sqlite3.OperationalError as e:
+                print(f"Full-text search unavailable (SQLite built without FTS5): {e}")
+                self.fts_enabled = False
+        finally:
+            conn.close()
+
+    def _rebuild_stale_index(self, conn: sqlite3.Connection) -> None:
+        """Empty an index built with older text extraction; index_pending() refills it"""
+        columns = [row['name'] for row in conn.execute("PRAGMA table_info(fts_state)")]
+        if 'text_version' not in columns:
+            conn.execute("ALTER TABLE fts_state ADD COLUMN text_version INTEGER NOT NULL DEFAULT 0")
+        if conn.execute("SELECT text_version FROM fts_state WHERE id = 1").fetchone()[0] < FTS_TEXT_VERSION:
+            conn.execute("DROP TABLE reports_fts")
+            conn.executescript(self.FTS_SCHEMA)
+            conn.execute("UPDATE fts_state SET last_indexed_id = 0, text_version = ? WHERE id = 1",
+                         (FTS_TEXT_VERSION,))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def save(self, report: str, person: str, company: str, mode: str,
+             processed_data: Dict = None, output_format: str = 'markdown',
+             person_type: str = None, company_type: str = None) -> int:
+        """Store a report in a single transaction and return its archive id"""
+        data_blob = None
+        if processed_data is not None:
+            data_blob = zlib.compress(
+                json.dumps(processed_data, ensure_ascii=False, default=str).encode('utf-8')
+            )
+
+        row = (
+            person, company, person_key(person), company_key(company), mode, output_format,
+            person_type, company_type, datetime.now().isoformat(),
+            zlib.compress(report.encode('utf-8')), data_blob
+        )
+
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    """INSERT INTO reports (person, company, person_key, company_key, mode,
+                       output_format, person_type, company_type, created_at, report, data)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    row
+                )
+                report_id = cursor.lastrowid
+                if self.fts_enabled and self._index_is_current(conn, report_id - 1):
+                    self._index_report(conn, report_id, person, company, searchable_text(report, output_format),
+                                       processed_data)
+                    conn.execute("UPDATE fts_state SET last_indexed_id = ? WHERE id = 1", (report_id,))
+            return report_id
+        finally:
+            conn.close()
+
+    def latest(self, person: str, company: str, mode: str = None) -> Optional[Dict]:
+        """Return the most recent report for a person at a company"""
+        query = "SELECT * FROM reports WHERE person_key = ? AND company_key = ?"
+        params = [person_key(person), company_key(company)]
+        if mode:
+            query += " AND mode = ?"
+            params.append(mode)
+        query += " ORDER BY created_at DESC LIMIT 1"
+
+        conn = self._connect()
+        try:
+            row = conn.execute(query, params).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def get(self, report_id: int) -> Optional[Dict]:
+        """Return a stored report by id"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def list_reports(self, limit: int = 20, person: str = None) -> List[Dict]:
+        """List recent reports without decompressing their contents"""
+        query = """SELECT id, person, company, mode, output_format, person_type,
+                   company_type, created_at FROM reports"""
+        params = []
+        if person:
+            query += " WHERE person_key = ?"
+            params.append(person_key(person))
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(query, params)]
+        finally:
+            conn.close()
+
+    def index_pending(self) -> int:
+        """Add reports archived since the last indexing pass to the full-text index"""
+        if not self.fts_enabled:
+            return 0
+
+        conn = self._connect()
+        try:
+            indexed = 0
+            with conn:
+                last_id = conn.execute("SELECT last_indexed_id FROM fts_state WHERE id = 1").fetchone()[0]
+                rows = conn.execute("SELECT * FROM reports WHERE id > ? ORDER BY id", (last_id,))
+                for row in rows:
+                    record = self._row_to_dict(row)
+                    self._index_report(
+                        conn, record['id'], record['person'], record['company'],
+                        searchable_text(record['report'], record['output_format']), record.get('data')
+                    )
+                    last_id = record['id']
+                    indexed += 1
+                conn.execute("UPDATE fts_state SET last_indexed_id = ? WHERE id = 1", (last_id,))
+            return indexed
+        finally:
+            conn.close()
+
+    def search(self, query: str, person_type: str = None, company_type: str = None,
+               max_age_days: float = None, limit: int = 10) -> List[Dict]:
+        """Ranked full-text search over archived reports and their key points"""
+        if not self.fts_enabled:
+            return []
+
+        match = self._fts_query(query)
+        if not match:
+            return []
+
+        self.index_pending()
+
+        sql = """SELECT r.id, r.person, r.company, r.mode, r.output_format, r.person_type, r.company_type,
+                 r.created_at, r.report, bm25(reports_fts, 5.0, 3.0, 1.0, 2.0) AS rank
+                 FROM reports_fts JOIN reports r ON r.id = reports_fts.rowid
+                 WHERE reports_fts MATCH ?"""
+        params = [match]
+        if person_type:
+            sql += " AND r.person_type = ?"
+            params.append(person_type)
+        if company_type:
+            sql += " AND r.company_type = ?"
+            params.append(company_type)
+        if max_age_days is not None:
+            sql += " AND r.created_at >= ?"
+            params.append((datetime.now() - timedelta(days=max_age_days)).isoformat())
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        terms = [term.lower() for term in re.findall(r'\w+', query)]
+        results = []
+        for row in rows:
+            record = dict(row)
+            report = searchable_text(zlib.decompress(record.pop('report')).decode('utf-8'), record['output_format'])
+            record['score'] = -record.pop('rank')
+            record['snippet'] = self._snippet(report, terms)
+            results.append(record)
+        return results
+
+    def _index_is_current(self, conn: sqlite3.Connection, report_id: int) -> bool:
+        """Check that every report up to report_id is already in the index"""
+        row = conn.execute("SELECT last_indexed_id FROM fts_state WHERE id = 1").fetchone()
+        return row is not None and row[0] == report_id
+
+    def _index_report(self, conn: sqlite3.Connection, report_id: int, person: str, company: str,
+                      report: str, processed_data: Optional[Dict]) -> None:
+        """Write one report's readable text (see searchable_text) into the full-text index"""
+        conn.execute(
+            "INSERT INTO reports_fts (rowid, person, company, report, key_points) VALUES (?, ?, ?, ?, ?)",
+            (report_id, person, company, report, '\n'.join(self._key_points(processed_data)))
+        )
+
+    def _key_points(self, processed_data: Optional[Dict]) -> List[str]:
+        """Collect extracted key points and opinions from processed data"""
+        if not processed_data:
+            return []
+
+        points = []
+        points.extend(processed_data.get('person', {}).get('key_points', []))
+        points.extend(processed_data.get('company', {}).get('key_points', []))
+        points.extend(processed_data.get('insights', {}).get('key_opinions', []))
+        return [point for point in points if isinstance(point, str)]
+
+    def _fts_query(self, query: str) -> str:
+        """Turn free text into an FTS5 query matching all terms"""
+        terms = re.findall(r'\w+', query or '')
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def _snippet(self, report: str, terms: List[str], width: int = 160) -> str:
+        """Return a short window of report text around the first matching term"""
+        lowered = report.lower()
+        positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+        start = max(min(positions) - width // 4, 0) if positions else 0
+        snippet = ' '.join(report[start:start + width].split())
+        return f"...{snippet}..." if start else f"{snippet}..."
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        """Decompress a stored row into a plain dict"""
+        record = dict(row)
+        record['report'] = zlib.decompress(record['report']).decode('utf-8')
+        if record.get('data') is not None:
+            record['data'] = json.loads(zlib.decompress(record['data']).decode('utf-8'))
+        return record
@@ -1,216 +1,369 @@
-from typing import Dict
+from typing import Dict, Iterable, List
 from datetime import datetime
+import html
+import io
+import json
 import os
+import re
+import threading
+from config import Config
 
-class ReportGenerator:
-    def __init__(self):
-        self.template_path = "templates/"
-    
-    def generate_comprehensive_report(self, processed_data: Dict) -> str:
-        """Generate a comprehensive research report"""
-        
-        person_data = processed_data.get('person', {})
-        company_data = processed_data.get('company', {})
-        insights_data = processed_data.get('insights', {})
-        metadata = processed_data.get('metadata', {})
-        
-        report = f"""# Research Report: {person_data.get('name', 'Unknown')} at {company_data.get('name', 'Unknown')}
+# Output formats supported by the renderer and the file extension used when saving
+FORMAT_EXTENSIONS = {
+    'markdown': 'md',
+    'html': 'html',
+    'json': 'json'
+}
 
-*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
-*Sources analyzed: {metadata.get('total_sources', 0)}*
+# Template-backed formats; JSON is serialized straight from the report view
+TEMPLATE_EXTENSIONS = {
+    'markdown': 'md',
+    'html': 'html'
+}
 
----
+_PLACEHOLDER_PATTERN = re.compile(r'\$([_a-zA-Z][_a-zA-Z0-9]*)')
 
-## 🧑‍💼 Person Profile
 
-**Name:** {person_data.get('name', 'N/A')}  
-**Company:** {person_data.get('company', 'N/A')}  
-**Role Type:** {person_data.get('type', 'Unknown').title()}  
+class CompiledTemplate:
+    """A report template split once into literal text and placeholder names"""
 
-### Professional Analysis
-{person_data.get('analysis', 'No analysis available.')}
+    def __init__(self, source: str):
+        self.chunks = []
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(source):
+            self.chunks.append((source[position:match.start()], match.group(1)))
+            position = match.end()
+        self.chunks.append((source[position:], None))
 
-### Key Points
-"""
-        
-        # Add key points for person
-        person_key_points = person_data.get('key_points', [])
-        if person_key_points:
-            for i, point in enumerate(person_key_points, 1):
-                report += f"{i}. {point}\n"
-        else:
-            report += "- No key points extracted\n"
-        
-        report += f"""
+    def render_to(self, buffer: io.StringIO, context: Dict) -> None:
+        """Write the rendered template into an output buffer"""
+        for literal, key in self.chunks:
+            buffer.write(literal)
+            if key is not None:
+                buffer.write(str(context.get(key, '')))
 
----
 
-## 🏢 Company Analysis
+# Compiled templates are shared by every ReportGenerator in the process
+_template_cache: Dict[str, CompiledTemplate] = {}
+_template_lock = threading.Lock()
 
-**Company:** {company_data.get('name', 'N/A')}  
-**Type:** {company_data.get('type', 'Unknown').title()}  
 
-### Company Overview
-{company_data.get('analysis', 'No analysis available.')}
+def load_template(template_path: str, name: str) -> CompiledTemplate:
+    """Load and compile a template file, reusing the compiled copy on later calls"""
+    path = os.path.join(template_path, name)
+    template = _template_cache.get(path)
+    if template is None:
+        with _template_lock:
+            template = _template_cache.get(path)
+            if template is None:
+                with open(path, 'r', encoding='utf-8') as f:
+                    template = CompiledTemplate(f.read())
+                _template_cache[path] = template
+    return template
 
-### Key Company Points
-"""
-        
-        # Add key points for company
-        company_key_points = company_data.get('key_points', [])
-        if company_key_points:
-            for i, point in enumerate(company_key_points, 1):
-                report += f"{i}. {point}\n"
-        else:
-            report += "- No key points extracted\n"
-        
-        report += f"""
 
----
+class ReportGenerator:
+    def __init__(self):
+        template_path = Config.REPORT_TEMPLATE_PATH
+        if not os.path.isabs(template_path):
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            template_path = os.path.join(project_root, template_path)
+        self.template_path = template_path
 
-## 💡 Insights & Opinions
+    def generate_comprehensive_report(self, processed_data: Dict, output_format: str = 'markdown') -> str:
+        """Generate a comprehensive research report"""
+        return self.render_comprehensive_report(processed_data, [output_format])[output_format]
 
-### Social Media & Blog Analysis
-{insights_data.get('insights', 'No insights available.')}
+    def generate_quick_report(self, person_name: str, company_name: str,
+                            person_analysis: Dict, company_analysis: Dict,
+                            output_format: str = 'markdown') -> str:
+        """Generate a quick summary report"""
+        return self.render_quick_report(
+            person_name, company_name, person_analysis, company_analysis, [output_format]
+        )[output_format]
 
-### Key Opinions & Viewpoints
-"""
-        
-        # Add key opinions
-        key_opinions = insights_data.get('key_opinions', [])
-        if key_opinions:
-            for i, opinion in enumerate(key_opinions, 1):
-                report += f"{i}. {opinion}\n"
-        else:
-            report += "- No specific opinions extracted\n"
-        
-        report += """
+    def generate_investor_report(self, person_name: str, vc_firm: str,
+                               analysis: Dict, insights: Dict,
+                               output_format: str = 'markdown') -> str:
+        """Generate investor-focused report"""
+        return self.render_investor_report(
+            person_name, vc_firm, analysis, insights, [output_format]
+        )[output_format]
 
----
+    def render_comprehensive_report(self, processed_data: Dict, formats: Iterable[str]) -> Dict[str, str]:
+        """Render a comprehensive report in several formats from one pass over the data"""
 
-## 📋 Meeting Preparation Summary
+        person_data = processed_data.get('person', {})
+        company_data = processed_data.get('company', {})
+        insights_data = processed_data.get('insights', {})
+        metadata = processed_data.get('metadata', {})
 
-### What to Know Before the Meeting:
-"""
-        
         # Generate meeting prep based on person type
         person_type = person_data.get('type', 'unknown')
         if person_type == 'investor':
-            report += self._generate_investor_meeting_prep(person_data, company_data, insights_data)
+            meeting_prep = self._generate_investor_meeting_prep(person_data, company_data, insights_data)
         elif person_type == 'founder':
-            report += self._generate_founder_meeting_prep(person_data, company_data, insights_data)
+            meeting_prep = self._generate_founder_meeting_prep(person_data, company_data, insights_data)
         else:
-            report += self._generate_general_meeting_prep(person_data, company_data, insights_data)
-        
-        report += f"""
+            meeting_prep = self._generate_general_meeting_prep(person_data, company_data, insights_data)
 
----
+        view = {
+            'report_type': 'comprehensive',
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'person': {
+                'name': person_data.get('name', 'Unknown'),
+                'company': person_data.get('company', 'N/A'),
+                'type': person_type,
+                'analysis': person_data.get('analysis', 'No analysis available.'),
+                'key_points': person_data.get('key_points', []),
+                'incomplete': bool(person_data.get('incomplete', False))
+            },
+            'company': {
+                'name': company_data.get('name', 'Unknown'),
+                'type': company_data.get('type', 'unknown'),
+                'analysis': company_data.get('analysis', 'No analysis available.'),
+                'key_points': company_data.get('key_points', []),
+                'incomplete': bool(company_data.get('incomplete', False))
+            },
+            'insights': {
+                'insights': insights_data.get('insights', 'No insights available.'),
+                'key_opinions': insights_data.get('key_opinions', []),
+                'incomplete': bool(insights_data.get('incomplete', False))
+            },
+            'meeting_prep': [{'title': title, 'detail': detail} for title, detail in meeting_prep],
+            'metadata': metadata
+        }
 
-*Report generated by AI Research Agent*  
-*Data accuracy depends on publicly available information*
-"""
-        
-        return report
-    
-    def generate_quick_report(self, person_name: str, company_name: str, 
-                            person_analysis: Dict, company_analysis: Dict) -> str:
-        """Generate a quick summary report"""
-        
-        report = f"""# Quick Research: {person_name} at {company_name}
+        def build_context(output_format: str) -> Dict:
+            text = self._escaper(output_format)
+            return {
+                'generated_at': view['generated_at'],
+                'total_sources': metadata.get('total_sources', 0),
+                'total_tokens': metadata.get('token_usage', {}).get('total_tokens', 0),
+                'person_name': text(view['person']['name']),
+                'person_company': text(view['person']['company']),
+                'person_type': text(view['person']['type'].title()),
+                'person_analysis': text(view['person']['analysis']),
+                'person_key_points': self._render_list(
+                    view['person']['key_points'], output_format, 'No key points extracted'
+                ),
+                'company_name': text(view['company']['name']),
+                'company_type': text(view['company']['type'].title()),
+                'company_analysis': text(view['company']['analysis']),
+                'company_key_points': self._render_list(
+                    view['company']['key_points'], output_format, 'No key points extracted'
+                ),
+                'insights': text(view['insights']['insights']),
+                'key_opinions': self._render_list(
+                    view['insights']['key_opinions'], output_format, 'No specific opinions extracted'
+                ),
+                'meeting_prep': self._render_meeting_prep(meeting_prep, output_format),
+                'title': text(f"Research Report: {view['person']['name']} at {view['company']['name']}"),
+                **self._notices(view, ('person', 'company', 'insights'), output_format)
+            }
 
-*Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}*
+        return self._render('comprehensive', view, build_context, formats)
 
-## Person Summary
-{person_analysis.get('analysis', 'No analysis available.')[:500]}...
+    def render_quick_report(self, person_name: str, company_name: str,
+                            person_analysis: Dict, company_analysis: Dict,
+                            formats: Iterable[str]) -> Dict[str, str]:
+        """Render a quick summary report in several formats"""
 
-## Company Summary  
-{company_analysis.get('analysis', 'No analysis available.')[:500]}...
+        view = {
+            'report_type': 'quick',
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'person': {
+                'name': person_name,
+                'type': person_analysis.get('type', 'Unknown'),
+                'summary': person_analysis.get('analysis', 'No analysis available.')[:500],
+                'incomplete': bool(person_analysis.get('incomplete', False))
+            },
+            'company': {
+                'name': company_name,
+                'type': company_analysis.get('type', 'Unknown'),
+                'summary': company_analysis.get('analysis', 'No analysis available.')[:500],
+                'incomplete': bool(company_analysis.get('incomplete', False))
+            }
+        }
 
-## Meeting Readiness
-- Person Type: {person_analysis.get('type', 'Unknown')}
-- Company Type: {company_analysis.get('type', 'Unknown')}
-- Recommended talking points based on their background and company focus
+        def build_context(output_format: str) -> Dict:
+            text = self._escaper(output_format)
+            return {
+                'generated_at': view['generated_at'],
+                'person_name': text(person_name),
+                'company_name': text(company_name),
+                'person_summary': text(view['person']['summary']),
+                'company_summary': text(view['company']['summary']),
+                'person_type': text(view['person']['type']),
+                'company_type': text(view['company']['type']),
+                'title': text(f"Quick Research: {person_name} at {company_name}"),
+                **self._notices(view, ('person', 'company'), output_format)
+            }
 
-*This is a quick summary. Run full research for detailed insights.*
-"""
-        return report
-    
-    def generate_investor_report(self, person_name: str, vc_firm: str, 
-                               analysis: Dict, insights: Dict) -> str:
-        """Generate investor-focused report"""
-        
-        report = f"""# Investor Profile: {person_name} at {vc_firm}
+        return self._render('quick', view, build_context, formats)
+
+    def render_investor_report(self, person_name: str, vc_firm: str,
+                               analysis: Dict, insights: Dict,
+                               formats: Iterable[str]) -> Dict[str, str]:
+        """Render an investor-focused report in several formats"""
+
+        view = {
+            'report_type': 'investor',
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'person': {
+                'name': person_name,
+                'incomplete': bool(analysis.get('incomplete', False))
+            },
+            'company': {'name': vc_firm},
+            'analysis': analysis.get('analysis', 'No analysis available.'),
+            'insights': {
+                'insights': insights.get('insights', 'No insights available.'),
+                'incomplete': bool(insights.get('incomplete', False))
+            }
+        }
 
-*Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}*
+        def build_context(output_format: str) -> Dict:
+            text = self._escaper(output_format)
+            return {
+                'generated_at': view['generated_at'],
+                'person_name': text(person_name),
+                'company_name': text(vc_firm),
+                'analysis': text(view['analysis']),
+                'insights': text(view['insights']['insights']),
+                'title': text(f"Investor Profile: {person_name} at {vc_firm}"),
+                **self._notices(view, ('person', 'insights'), output_format)
+            }
 
-## Investment Profile
-{analysis.get('analysis', 'No analysis available.')}
+        return self._render('investor', view, build_context, formats)
 
-## Investment Philosophy & Opinions
-{insights.get('insights', 'No insights available.')}
+    def _render(self, template_name: str, view: Dict, build_context, formats: Iterable[str]) -> Dict[str, str]:
+        """Render the report view into each requested format"""
+        rendered = {}
+        for output_format in formats:
+            if output_format == 'json':
+                rendered['json'] = json.dumps(view, indent=2, ensure_ascii=False, default=str)
+                continue
 
-## Key Preparation Points for Pitch Meeting:
-- Research their portfolio companies for relevant examples
-- Understand their investment thesis and focus areas  
-- Prepare questions about their recent investments
-- Align your pitch with their stated interests and opinions
-- Be ready to discuss market trends they've commented on
+            extension = TEMPLATE_EXTENSIONS.get(output_format)
+            if extension is None:
+                raise ValueError(f"Unsupported report format: {output_format}")
 
-## Next Steps:
-- Review their portfolio companies
-- Read their recent blog posts or tweets
-- Prepare specific questions about their investment approach
-"""
-        return report
+            template = load_template(self.template_path, f"{template_name}.{extension}")
+            buffer = io.StringIO()
+            template.render_to(buffer, build_context(output_format))
+            rendered[output_format] = buffer.getvalue()
+
+        return rendered
+
+    def _notices(self, view: Dict, sections: Iterable[str], output_format: str) -> Dict[str, str]:
+        """Warnings for sections that did not finish before the run's deadline"""
+        notices = {}
+        incomplete = False
+        for section in sections:
+            section_incomplete = view.get(section, {}).get('incomplete', False)
+            incomplete = incomplete or section_incomplete
+            notices[f"{section}_notice"] = self._notice(
+                "Incomplete: this section did not finish before the deadline.", output_format
+            ) if section_incomplete else ''
+        
+        if incomplete:
+            if output_format == 'html':
+                notices['status_notice'] = self._notice("Partial report: the deadline was reached before every section finished.", 'html')
+            else:
+                notices['status_notice'] = "\n*⚠️ Partial report: the deadline was reached before every section finished.*"
+        else:
+            notices['status_notice'] = ''
+        return notices
     
-    def _generate_investor_meeting_prep(self, person_data: Dict, company_data: Dict, insights_data: Dict) -> str:
-        """Generate meeting prep for investors"""
-        prep = """
-1. **Investment Focus**: Research their investment thesis and portfolio companies
-2. **Recent Opinions**: Review their latest thoughts on market trends and opportunities  
-3. **Portfolio Alignment**: Identify how your business aligns with their existing investments
-4. **Questions to Ask**: Prepare thoughtful questions about their investment approach
-5. **Market Perspective**: Be ready to discuss industry trends they've commented on
-"""
-        return prep
+    def _notice(self, message: str, output_format: str) -> str:
+        if output_format == 'html':
+            return f'<p class="incomplete">⚠️ {html.escape(message)}</p>\n'
+        return f"> ⚠️ {message}\n\n"
     
-    def _generate_founder_meeting_prep(self, person_data: Dict, company_data: Dict, insights_data: Dict) -> str:
+    def _escaper(self, output_format: str):
+        """Return the function used to make plain text safe for a format"""
+        if output_format == 'html':
+            return lambda value: html.escape(str(value))
+        return str
+
+    def _render_list(self, items: List[str], output_format: str, empty_text: str) -> str:
+        """Render a numbered list, or a placeholder line when it is empty"""
+        buffer = io.StringIO()
+        if output_format == 'html':
+            if items:
+                buffer.write("<ol>\n")
+                for item in items:
+                    buffer.write(f"<li>{html.escape(item)}</li>\n")
+                buffer.write("</ol>")
+            else:
+                buffer.write(f"<p>{html.escape(empty_text)}</p>")
+        else:
+            if items:
+                for i, item in enumerate(items, 1):
+                    buffer.write(f"{i}. {item}\n")
+            else:
+                buffer.write(f"- {empty_text}\n")
+        return buffer.getvalue()
+
+    def _render_meeting_prep(self, meeting_prep: List[tuple], output_format: str) -> str:
+        """Render meeting prep items as a numbered list"""
+        buffer = io.StringIO()
+        if output_format == 'html':
+            buffer.write("<ol>\n")
+            for title, detail in meeting_prep:
+                buffer.write(f"<li><strong>{html.escape(title)}</strong>: {html.escape(detail)}</li>\n")
+            buffer.write("</ol>")
+        else:
+            for i, (title, detail) in enumerate(meeting_prep, 1):
+                buffer.write(f"{i}. **{title}**: {detail}\n")
+        return buffer.getvalue()
+
+    def _generate_investor_meeting_prep(self, person_data: Dict, company_data: Dict, insights_data: Dict) -> List[tuple]:
+        """Generate meeting prep for investors"""
+        return [
+            ("Investment Focus", "Research their investment thesis and portfolio companies"),
+            ("Recent Opinions", "Review their latest thoughts on market trends and opportunities"),
+            ("Portfolio Alignment", "Identify how your business aligns with their existing investments"),
+            ("Questions to Ask", "Prepare thoughtful questions about their investment approach"),
+            ("Market Perspective", "Be ready to discuss industry trends they've commented on")
+        ]
+
+    def _generate_founder_meeting_prep(self, person_data: Dict, company_data: Dict, insights_data: Dict) -> List[tuple]:
         """Generate meeting prep for founders"""
-        prep = """
-1. **Company Understanding**: Know their business model, recent developments, and challenges
-2. **Personal Background**: Understand their journey and key achievements
-3. **Industry Expertise**: Be prepared to discuss industry trends and opportunities
-4. **Potential Collaboration**: Identify areas where you might work together
-5. **Shared Interests**: Look for common ground in their public statements and opinions
-"""
-        return prep
-    
-    def _generate_general_meeting_prep(self, person_data: Dict, company_data: Dict, insights_data: Dict) -> str:
+        return [
+            ("Company Understanding", "Know their business model, recent developments, and challenges"),
+            ("Personal Background", "Understand their journey and key achievements"),
+            ("Industry Expertise", "Be prepared to discuss industry trends and opportunities"),
+            ("Potential Collaboration", "Identify areas where you might work together"),
+            ("Shared Interests", "Look for common ground in their public statements and opinions")
+        ]
+
+    def _generate_general_meeting_prep(self, person_data: Dict, company_data: Dict, insights_data: Dict) -> List[tuple]:
         """Generate general meeting prep"""
-        prep = """
-1. **Professional Background**: Review their experience and expertise areas
-2. **Company Context**: Understand their role and company's position in the market
-3. **Recent Activities**: Be aware of their latest projects and public statements
-4. **Common Ground**: Identify shared interests or experiences
-5. **Relevant Questions**: Prepare thoughtful questions about their work and industry
-"""
-        return prep
-    
-    def save_report(self, report: str, filename: str = None) -> str:
+        return [
+            ("Professional Background", "Review their experience and expertise areas"),
+            ("Company Context", "Understand their role and company's position in the market"),
+            ("Recent Activities", "Be aware of their latest projects and public statements"),
+            ("Common Ground", "Identify shared interests or experiences"),
+            ("Relevant Questions", "Prepare thoughtful questions about their work and industry")
+        ]
+
+    def save_report(self, report: str, filename: str = None, output_format: str = 'markdown') -> str:
         """Save report to file"""
         if not filename:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"research_report_{timestamp}.md"
-        
+            extension = FORMAT_EXTENSIONS.get(output_format, 'md')
+            filename = f"research_report_{timestamp}.{extension}"
+
         # Create reports directory if it doesn't exist
-        os.makedirs("reports", exist_ok=True)
-        
-        filepath = os.path.join("reports", filename)
-        
+        os.makedirs(Config.OUTPUT_PATH, exist_ok=True)
+
+        filepath = os.path.join(Config.OUTPUT_PATH, filename)
+
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(report)
             return filepath
         except Exception as e:
             print(f"Error saving report: {e}")
-            return None
\ No newline at end of file
+            return None
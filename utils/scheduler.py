@@ -0,0 +1,137 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict
+from config import Config
+from utils.deadline import Deadline, DeadlineExceeded
+
+# Priority classes, most urgent first
+PRIORITY_CLASSES = ('interactive', 'batch')
+
+_priority = contextvars.ContextVar('scheduling_priority', default='interactive')
+
+
+@contextmanager
+def scheduling_priority(priority: str):
+    """Run the enclosed work (and anything propagate() hands to other threads) in a priority class"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def propagate(call: Callable) -> Callable:
+    """Wrap a call for a worker thread so it keeps the submitting thread's priority"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(call, *args, **kwargs)
+
+
+class Scheduler:
+    """Limits concurrent calls to one upstream service and hands free slots out by priority
+
+    Waiting calls are served by weighted round robin between priority classes
+    (Config.SCHEDULER_WEIGHTS), FIFO within a class: interactive calls overtake queued
+    batch calls, while batch work still gets a share of the slots and never starves.
+    """
+
+    def __init__(self, name: str, slots: int, weights: Dict[str, int] = None):
+        self.name = name
+        self.slots = slots
+        self.weights = dict(weights or Config.SCHEDULER_WEIGHTS)
+        self._condition = threading.Condition()
+        self._active = 0
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._credits = dict(self.weights)
+        self._granted = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._max_queued = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._waits = {priority: deque(maxlen=Config.SCHEDULER_WAIT_SAMPLES) for priority in PRIORITY_CLASSES}
+
+    @contextmanager
+    def slot(self, deadline: Deadline = None, priority: str = None):
+        """Hold one of the service's slots for the enclosed call
+
+        Raises DeadlineExceeded if the run's deadline passes while still queued.
+        """
+        self._acquire(priority or current_priority(), Deadline.coerce(deadline))
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    def _acquire(self, priority: str, deadline: Deadline) -> None:
+        waiter = object()
+        queued_at = time.monotonic()
+        with self._condition:
+            queue = self._queues[priority]
+            queue.append(waiter)
+            self._max_queued[priority] = max(self._max_queued[priority], len(queue))
+
+            while not (self._active < self.slots and queue[0] is waiter and self._next_class() == priority):
+                remaining = deadline.remaining()
+                if remaining is not None and remaining <= 0:
+                    queue.remove(waiter)
+                    self._condition.notify_all()
+                    raise DeadlineExceeded(f"Deadline reached while queued for {self.name}")
+                self._condition.wait(remaining)
+
+            queue.popleft()
+            self._active += 1
+            self._credits[priority] -= 1
+            self._granted[priority] += 1
+            self._waits[priority].append(time.monotonic() - queued_at)
+            # More slots may be free for the next waiter
+            self._condition.notify_all()
+
+    def _next_class(self) -> str:
+        """Priority class to serve next: the most urgent waiting class with credits left"""
+        waiting = [priority for priority in PRIORITY_CLASSES if self._queues[priority]]
+        for priority in waiting:
+            if self._credits[priority] > 0:
+                return priority
+        # Every waiting class used its share of this round: start a new round
+        self._credits = dict(self.weights)
+        return waiting[0] if waiting else None
+
+    def stats(self) -> Dict:
+        """Queue depth and wait-time percentiles per priority class"""
+        with self._condition:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = sorted(self._waits[priority])
+                classes[priority] = {
+                    'queued': len(self._queues[priority]),
+                    'max_queued': self._max_queued[priority],
+                    'granted': self._granted[priority],
+                    'wait_p50': waits[len(waits) // 2] if waits else 0.0,
+                    'wait_p95': waits[min(int(len(waits) * 0.95), len(waits) - 1)] if waits else 0.0
+                }
+            return {'slots': self.slots, 'active': self._active, 'classes': classes}
+
+
+_schedulers: Dict[str, Scheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(service: str) -> Scheduler:
+    """The process-wide scheduler for an upstream service ('jina', 'gemini')"""
+    with _schedulers_lock:
+        if service not in _schedulers:
+            _schedulers[service] = Scheduler(service, Config.SCHEDULER_SLOTS[service])
+        return _schedulers[service]
+
+
+def scheduler_stats() -> Dict[str, Dict]:
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {service: scheduler.stats() for service, scheduler in schedulers.items()}
@@ -0,0 +1,102 @@
+import sys
+import zlib
+from typing import Dict, Iterator, Tuple
+from urllib.parse import urlparse
+
+# Content shorter than this is kept as plain text; compressing it would save little
+COMPACT_MIN_CHARS = 512
+
+FIELDS = ('title', 'url', 'domain', 'content', 'snippet', 'content_fetched')
+
+
+class SearchResult:
+    """One search result, stored compactly
+
+    URLs and domains are interned, since the same pages come back for many queries
+    and entities, and long page content is kept zlib-compressed until it is read.
+    Results still behave like the plain dicts used before (result['url'],
+    result.get('content', '')), so analyzers and processors need no changes.
+    """
+
+    __slots__ = ('title', 'url', 'domain', 'snippet', 'content_fetched', '_content', '_compressed')
+
+    def __init__(self, title: str = '', url: str = '', content: str = '', snippet: str = '',
+                 content_fetched: bool = False):
+        self.title = title
+        self.url = sys.intern(url)
+        self.domain = sys.intern(urlparse(url).netloc.lower()) if url else ''
+        self.snippet = snippet
+        self.content_fetched = content_fetched
+        self.content = content
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SearchResult':
+        return cls(
+            title=data.get('title', ''),
+            url=data.get('url', ''),
+            content=data.get('content', ''),
+            snippet=data.get('snippet', ''),
+            content_fetched=data.get('content_fetched', False)
+        )
+
+    @property
+    def content(self) -> str:
+        if self._compressed:
+            return zlib.decompress(self._content).decode('utf-8')
+        return self._content
+
+    @content.setter
+    def content(self, text: str) -> None:
+        text = text or ''
+        if text is self.snippet or len(text) < COMPACT_MIN_CHARS:
+            # Snippet-only results share the snippet string instead of storing it twice
+            self._content, self._compressed = text, False
+        else:
+            self._content, self._compressed = zlib.compress(text.encode('utf-8'), 1), True
+
+    def release(self) -> None:
+        """Drop the page content once analysis has consumed it; title and URL are kept"""
+        self._content, self._compressed = '', False
+        self.snippet = ''
+
+    def copy(self) -> 'SearchResult':
+        duplicate = SearchResult.__new__(SearchResult)
+        for slot in self.__slots__:
+            setattr(duplicate, slot, getattr(self, slot))
+        return duplicate
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+    # Dict-style access, for code written against plain result dicts
+
+    def __getitem__(self, key: str):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in FIELDS or key == 'domain':
+            raise KeyError(key)
+        if key == 'url':
+            value = sys.intern(value)
+            self.domain = sys.intern(urlparse(value).netloc.lower())
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in FIELDS
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return FIELDS
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        return ((key, getattr(self, key)) for key in FIELDS)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"SearchResult(title={self.title!r}, url={self.url!r})"
@@ -0,0 +1,105 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+from config import Config
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+class TokenUsage:
+    """Gemini input/output token tallies per stage for one report or one batch
+
+    Counts come from the provider's usage metadata when it is returned and from
+    estimate_tokens() otherwise. With a budget, fit() decides before the analyses
+    run which optional stages to skip and how much context each stage may send.
+    """
+
+    def __init__(self, budget: int = None):
+        self.budget = budget
+        self.stages: Dict[str, Dict[str, int]] = {}
+        # Context tokens each stage may send, set by fit()
+        self.context_limits: Dict[str, int] = {}
+        self.skipped_stages: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, input_tokens: int, output_tokens: int, estimated: bool = False) -> None:
+        with self._lock:
+            tally = self.stages.setdefault(
+                stage, {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'estimated_calls': 0}
+            )
+            tally['calls'] += 1
+            tally['input_tokens'] += input_tokens
+            tally['output_tokens'] += output_tokens
+            tally['estimated_calls'] += int(estimated)
+
+    def add(self, other: 'TokenUsage') -> None:
+        """Fold another tally (one report of a batch, say) into this one"""
+        with other._lock:
+            stages = {stage: dict(tally) for stage, tally in other.stages.items()}
+            skipped = list(other.skipped_stages)
+        with self._lock:
+            for stage, counts in stages.items():
+                tally = self.stages.setdefault(
+                    stage, {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'estimated_calls': 0}
+                )
+                for field, value in counts.items():
+                    tally[field] += value
+            self.skipped_stages.extend(skipped)
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return sum(tally['input_tokens'] + tally['output_tokens'] for tally in self.stages.values())
+
+    def context_limit(self, stage: str) -> Optional[int]:
+        """Most context tokens a stage may send: its budget share, never more than MAX_CONTEXT_TOKENS"""
+        limits = [limit for limit in (self.context_limits.get(stage), Config.MAX_CONTEXT_TOKENS) if limit]
+        return min(limits) if limits else None
+
+    def fit(self, contexts: Dict[str, int], overhead: int, optional: Iterable[str] = ()) -> List[str]:
+        """Fit the upcoming stages into what is left of the budget
+
+        contexts maps each stage to its estimated context tokens; overhead is the rest
+        of a call's cost (instructions and the output allowance). Optional stages are
+        skipped first, in the order given; if the rest still does not fit, every
+        stage's context is trimmed in proportion. Returns the stages to skip.
+        """
+        if self.budget is None:
+            return []
+
+        available = self.budget - self.total_tokens
+        stages = {stage: min(tokens, self.context_limit(stage) or tokens) for stage, tokens in contexts.items()}
+
+        def cost() -> int:
+            return sum(stages.values()) + overhead * len(stages)
+
+        skipped = []
+        for stage in optional:
+            if cost() <= available:
+                break
+            if stages.pop(stage, None) is not None:
+                skipped.append(stage)
+
+        if stages and cost() > available:
+            share = max(available - overhead * len(stages), 0) / max(sum(stages.values()), 1)
+            for stage, tokens in stages.items():
+                self.context_limits[stage] = max(int(tokens * share), Config.MIN_CONTEXT_TOKENS)
+
+        with self._lock:
+            self.skipped_stages.extend(skipped)
+        return skipped
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            stages = {stage: dict(tally) for stage, tally in self.stages.items()}
+        return {
+            'input_tokens': sum(tally['input_tokens'] for tally in stages.values()),
+            'output_tokens': sum(tally['output_tokens'] for tally in stages.values()),
+            'total_tokens': sum(tally['input_tokens'] + tally['output_tokens'] for tally in stages.values()),
+            'calls': sum(tally['calls'] for tally in stages.values()),
+            'budget': self.budget,
+            'skipped_stages': list(self.skipped_stages),
+            'stages': stages
+        }
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+class TransportError(Exception):
+    """A replayed exchange that failed when it was recorded, or one that was never recorded"""
+
+
+class Transport:
+    """Sends Jina and Gemini requests; the base class simply makes the live call
+
+    Every call is described by a kind ('jina', 'gemini') and a request dict that
+    identifies it, so subclasses can record exchanges or answer them from a cassette.
+    Response bodies are any JSON-serializable value.
+    """
+
+    def call(self, kind: str, request: Dict, send: Callable[[], Any], deadline: Deadline = None) -> Any:
+        return send()
+
+    def close(self) -> None:
+        pass
+
+
+def request_key(kind: str, request: Dict) -> str:
+    """Stable key for a request; credentials are never part of it"""
+    canonical = json.dumps({'kind': kind, 'request': request}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def read_cassette(path: str) -> Iterator[Dict]:
+    """Entries of a cassette in recording order
+
+    Cassettes are concatenated gzip members. A recording that was interrupted ends
+    in a truncated member; the entries before it are still returned.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    while data:
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            text = decompressor.decompress(data)
+        except zlib.error as e:
+            print(f"Cassette {path} is damaged ({e}); replaying the entries before it")
+            return
+        if not decompressor.eof:
+            # Keep the complete lines of the truncated member
+            text = text[:text.rfind(b'\n') + 1]
+        for line in text.decode('utf-8').splitlines():
+            if line.strip():
+                yield json.loads(line)
+        if not decompressor.eof:
+            print(f"Cassette {path} ends in an incomplete entry (interrupted recording?); skipping it")
+            return
+        data = decompressor.unused_data
+
+
+class RecordingTransport(Transport):
+    """Makes live calls and appends each exchange (key, body, latency) to a gzip JSONL cassette"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'ab')
+        self._lock = threading.Lock()
+
+    def call(self, kind: str, request: Dict, send: Callable[[], Any], deadline: Deadline = None) -> Any:
+        started = time.monotonic()
+        entry = {'kind': kind, 'key': request_key(kind, request)}
+        try:
+            body = send()
+        except DeadlineExceeded:
+            # Out of budget before the request was sent: nothing to record
+            raise
+        except Exception as e:
+            entry.update(latency=time.monotonic() - started, error=f"{type(e).__name__}: {e}")
+            self._write(entry)
+            raise
+
+        entry.update(latency=time.monotonic() - started, body=body)
+        self._write(entry)
+        return body
+
+    def _write(self, entry: Dict) -> None:
+        # One complete gzip member per entry, so an interrupted run loses at most the entry being written
+        member = gzip.compress((json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8'))
+        with self._lock:
+            self._file.write(member)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class ReplayTransport(Transport):
+    """Answers requests from a recorded cassette, without network access
+
+    With realtime=True every reply waits as long as the original call took (within
+    the run's deadline), which reproduces slow runs; otherwise replies are immediate.
+    Repeated requests get their recordings in the original order.
+    """
+
+    def __init__(self, path: str, realtime: bool = False):
+        self.path = path
+        self.realtime = realtime
+        self._entries: Dict[str, List[Dict]] = {}
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        for entry in read_cassette(path):
+            self._entries.setdefault(entry['key'], []).append(entry)
+
+    def call(self, kind: str, request: Dict, send: Callable[[], Any], deadline: Deadline = None) -> Any:
+        key = request_key(kind, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise TransportError(f"No recorded {kind} response for this request in {self.path}")
+            position = self._positions.get(key, 0)
+            # Once the recordings run out, keep answering with the last one
+            self._positions[key] = position + 1
+            entry = entries[min(position, len(entries) - 1)]
+
+        if self.realtime:
+            self._wait(entry['latency'], Deadline.coerce(deadline))
+
+        if 'error' in entry:
+            raise TransportError(f"Recorded {kind} error: {entry['error']}")
+        return entry['body']
+
+    def _wait(self, latency: float, deadline: Deadline) -> None:
+        remaining = deadline.remaining()
+        if remaining is not None and remaining < latency:
+            time.sleep(remaining)
+            raise DeadlineExceeded(f"Replayed {latency:.1f}s call exceeded the deadline")
+        time.sleep(latency)